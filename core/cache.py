@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import connection
+
+
+class LocalCache:
+    """
+    Thread-safe in-process LRU cache whose entries expire after `ttl` seconds.
+    Used as a first level in front of the shared (Redis) cache for small,
+    hot, rarely-changing values.
+    """
+
+    def __init__(self, maxsize=1024, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                expires_at, value = self._data[key]
+            except KeyError:
+                return default
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def tenant_key(*parts):
+    """Builds an in-process cache key scoped to the active tenant schema."""
+    return (getattr(connection, 'schema_name', None),) + tuple(parts)
+
+
+def _generation_key(name):
+    return f"generation:{name}"
+
+
+def _changed_at_key(name):
+    return f"generation:{name}:changed_at"
+
+
+def get_generations(*names):
+    """
+    Returns the current value of each named cache generation. Generations are
+    embedded in cache keys so that bumping one orphans every entry built on it.
+    """
+    keys = {_generation_key(name): name for name in names}
+    found = cache.get_many(list(keys))
+    generations = {}
+    for key, name in keys.items():
+        if key not in found:
+            # Seed from the clock so an evicted counter never repeats an old value
+            cache.add(key, int(time.time() * 1000), None)
+            cache.add(_changed_at_key(name), time.time(), None)
+            found[key] = cache.get(key)
+        generations[name] = found[key]
+    return generations
+
+
+def bump_generation(name):
+    key = _generation_key(name)
+    cache.set(_changed_at_key(name), time.time(), None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), None)
+        return cache.get(key)
+
+
+def get_last_changed(*names):
+    """
+    Returns the latest time (a Unix timestamp) any of the named generations
+    was bumped, or None if that isn't known for all of them.
+    """
+    keys = [_changed_at_key(name) for name in names]
+    found = cache.get_many(keys)
+    if len(found) < len(keys):
+        return None
+    return max(found.values())
@@ -1,19 +1,16 @@
-from pages.models import SiteSettings, ThemeSettings
-from wagtail.models import Site
+from pages.theme import get_theme_resolver
 
 def global_context(request):
     """
     Injects global SiteSettings and ThemeSettings into the template context.
     This replaces the need for eager loading tags in every template.
+    Both come from the request's ThemeResolver (cached settings snapshots).
     """
     try:
-        site = Site.find_for_request(request)
-        if not site:
-            site = Site.objects.get(is_default_site=True)
-            
+        resolver = get_theme_resolver(request)
         return {
-            'settings': SiteSettings.for_site(site),
-            'config': ThemeSettings.for_site(site),
+            'settings': resolver.settings,
+            'config': resolver.config,
         }
     except Exception:
         # Fail silently to prevent 500 errors if site/settings are missing
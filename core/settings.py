@@ -49,6 +49,7 @@ SHARED_APPS = [
 
     'modelcluster',
     'taggit',
+    'compressor',
 
     'pages',
     'ai',
@@ -57,6 +58,9 @@ SHARED_APPS = [
 TENANT_APPS = [
     'django.contrib.auth',
     'django.contrib.contenttypes',
+
+    # Each tenant gets its own search index tables (see pages.search_index)
+    'wagtail.search',
     
     'pages',
     'ai',
@@ -68,7 +72,7 @@ TENANT_MODEL = 'tenants.Tenant'
 TENANT_DOMAIN_MODEL = 'tenants.Domain'
 
 MIDDLEWARE = [
-    'django_tenants.middleware.main.TenantMainMiddleware',
+    'tenants.middleware.CachedTenantMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -107,7 +111,7 @@ WSGI_APPLICATION = 'core.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django_tenants.postgresql_backend',
+        'ENGINE': 'tenants.postgresql_backend',
         'NAME': os.getenv('DB_NAME', 'cms_db'),
         'USER': os.getenv('DB_USER', 'postgres'),
         'PASSWORD': os.getenv('DB_PASSWORD', ''),
@@ -120,6 +124,72 @@ DATABASE_ROUTERS = (
     'django_tenants.routers.TenantSyncRouter',
 )
 
+# tenants.postgresql_backend only re-sends SET search_path when the schema changes.
+# It needs direct connections or pgbouncer in session pooling mode.
+TENANT_LIMIT_SET_CALLS = True
+
+
+# Cache
+# Redis is shared by every tenant, so keys are prefixed with the active schema.
+
+REDIS_URL = os.getenv('REDIS_URL', '')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            },
+            'KEY_FUNCTION': 'django_tenants.cache.make_key',
+            'REVERSE_KEY_FUNCTION': 'django_tenants.cache.reverse_key',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'KEY_FUNCTION': 'django_tenants.cache.make_key',
+        }
+    }
+
+# Seconds a SiteSettings/ThemeSettings snapshot lives in the shared cache and in each process
+SETTINGS_CACHE_TIMEOUT = int(os.getenv('SETTINGS_CACHE_TIMEOUT', 60 * 60 * 24))
+SETTINGS_CACHE_LOCAL_TTL = int(os.getenv('SETTINGS_CACHE_LOCAL_TTL', 30))
+
+# Hostname -> tenant/Site resolution cache (see tenants.middleware)
+TENANT_CACHE_TTL = int(os.getenv('TENANT_CACHE_TTL', 300))
+TENANT_CACHE_MAXSIZE = int(os.getenv('TENANT_CACHE_MAXSIZE', 2048))
+
+# Caches that are invalidated by bumping generations need every worker to
+# see the bump, so they're only on by default when the cache is shared
+SHARED_CACHE = bool(REDIS_URL)
+
+# Full-page HTML cache for anonymous visitors (see pages.page_cache)
+PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE_ENABLED', str(SHARED_CACHE and not DEBUG)) == 'True'
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', 60 * 15))
+
+# Strip whitespace and comments from pages stored in the page cache (see pages.compression)
+HTML_MINIFY_ENABLED = os.getenv('HTML_MINIFY_ENABLED', str(not DEBUG)) == 'True'
+
+# Send page sections as they render instead of in one response (see pages.streaming)
+PAGE_STREAMING_ENABLED = os.getenv('PAGE_STREAMING_ENABLED', 'False') == 'True'
+
+# Rendered HTML of individual StreamField sections (see pages.fragment_cache)
+FRAGMENT_CACHE_ENABLED = os.getenv('FRAGMENT_CACHE_ENABLED', str(SHARED_CACHE and not DEBUG)) == 'True'
+FRAGMENT_CACHE_TIMEOUT = int(os.getenv('FRAGMENT_CACHE_TIMEOUT', 60 * 60 * 24))
+
+# Load heavy below-the-fold sections from /_fragments/ as they scroll into view (see pages.fragments)
+LAZY_SECTIONS_ENABLED = os.getenv('LAZY_SECTIONS_ENABLED', 'False') == 'True'
+
+# Threads per web process generating image renditions in the background (see
+# pages.rendition_queue); 0 generates them on first request instead
+RENDITION_WORKERS = int(os.getenv('RENDITION_WORKERS', 2))
+
+# Compile every theme template when a worker boots (see pages.warmup)
+TEMPLATE_WARMUP = os.getenv('TEMPLATE_WARMUP', str(not DEBUG)) == 'True'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -161,6 +231,19 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+    'compressor.finders.CompressorFinder',
+]
+
+# SCSS goes through django-libsass, both in {% compress %} blocks and for the
+# per-site theme stylesheets compiled by pages.stylesheets
+COMPRESS_PRECOMPILERS = (
+    ('text/x-scss', 'django_libsass.SassCompiler'),
+)
+LIBSASS_OUTPUT_STYLE = 'compressed'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -169,3 +252,21 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Wagtail settings
 WAGTAIL_SITE_NAME = os.getenv('WAGTAIL_SITE_NAME', 'SaaS Website Builder')
 WAGTAILADMIN_BASE_URL = 'http://localhost:8000'
+
+# Cached search results and autocomplete suggestions (see pages.search)
+SEARCH_CACHE_TIMEOUT = int(os.getenv('SEARCH_CACHE_TIMEOUT', 60 * 60))
+
+# Queue search index updates for the process_search_index_queue worker
+# instead of indexing inside the request (see pages.search_index)
+SEARCH_INDEX_QUEUE = os.getenv('SEARCH_INDEX_QUEUE', 'True') == 'True'
+SEARCH_INDEX_BATCH_SIZE = int(os.getenv('SEARCH_INDEX_BATCH_SIZE', 200))
+
+# Postgres full-text search (tsvector columns with GIN indexes) in each
+# tenant schema; see pages.search_index
+WAGTAILSEARCH_BACKENDS = {
+    'default': {
+        'BACKEND': 'wagtail.search.backends.database',
+        'SEARCH_CONFIG': os.getenv('WAGTAILSEARCH_CONFIG', 'english'),
+        'AUTO_UPDATE': not SEARCH_INDEX_QUEUE,
+    }
+}
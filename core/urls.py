@@ -6,13 +6,16 @@ from django.urls import path, include, re_path
 from wagtail.admin import urls as wagtailadmin_urls
 from wagtail import urls as wagtail_urls
 from wagtail.documents import urls as wagtaildocs_urls
-from pages.views import search as search_view
+from pages.views import search as search_view, search_autocomplete, section_fragment, theme_stylesheet
 
 urlpatterns = [
     path('django-admin/', admin.site.urls),
     path('admin/', include(wagtailadmin_urls)),
     path('documents/', include(wagtaildocs_urls)),
     path('search/', search_view, name='search'),
+    path('search/autocomplete/', search_autocomplete, name='search_autocomplete'),
+    path('theme-css/<str:name>', theme_stylesheet, name='theme_stylesheet'),
+    path('_fragments/<int:page_id>/<str:block_id>/', section_fragment, name='section_fragment'),
 ]
 
 
@@ -17,3 +17,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+from pages.warmup import warm_up  # noqa: E402
+
+warm_up()
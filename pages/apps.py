@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class PagesConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'pages'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .theme_manifest import manifest
+
+        # Index theme templates once at startup instead of stat()ing per render
+        manifest.reload()
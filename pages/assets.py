@@ -0,0 +1,405 @@
+"""
+Self-hosted front-end bundles for the themes.
+
+`manage.py build_theme_assets` downloads the pinned Bootstrap, Font Awesome,
+AOS and Google Fonts files each theme's base.html used to load from CDNs and
+writes one CSS and one JS bundle per theme into pages/static/theme-bundles/,
+with fonts next to them. Bootstrap and Font Awesome CSS are purged down to
+the selectors whose classes appear in the theme's templates or in tenant
+content (icon fields and blocks), so Font Awesome ships only the icons
+actually used. Templates link the bundles inside {% compress %}, which
+content-hashes them; until a bundle is built they keep using the CDNs.
+Workers look for a rebuilt bundle every few seconds, so a build is picked
+up without a restart.
+"""
+import os
+import re
+from collections import namedtuple
+
+import requests
+from django.contrib.staticfiles import finders
+
+from core.cache import LocalCache
+
+from .theme_manifest import THEMES_DIR, get_template_dirs
+
+BUNDLE_DIR = 'theme-bundles'
+OUTPUT_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', BUNDLE_DIR)
+
+# How long a worker trusts what it found on disk for a bundle
+BUNDLE_CHECK_INTERVAL = 10
+
+BOOTSTRAP_CSS = 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css'
+BOOTSTRAP_JS = 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js'
+FONTAWESOME_CSS = 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css'
+FONTAWESOME_WEBFONTS = 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/webfonts/'
+AOS_CSS = 'https://unpkg.com/aos@2.3.1/dist/aos.css'
+AOS_JS = 'https://unpkg.com/aos@2.3.1/dist/aos.js'
+GOOGLE_FONTS_CSS = 'https://fonts.googleapis.com/css2'
+
+# Google Fonts only serves woff2 to browsers it recognises
+FONTS_USER_AGENT = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+)
+
+ThemeAssets = namedtuple('ThemeAssets', ['css', 'js', 'font_families', 'tenant_fonts'])
+
+# What each theme's base.html loads. Corporate picks its fonts from
+# ThemeSettings, so it bundles every family tenants have chosen.
+THEME_ASSETS = {
+    'corporate': ThemeAssets(
+        css=(BOOTSTRAP_CSS, FONTAWESOME_CSS, AOS_CSS),
+        js=(BOOTSTRAP_JS, AOS_JS),
+        font_families=('Inter:wght@300;400;500;600;700;800',),
+        tenant_fonts=True,
+    ),
+    'creative': ThemeAssets(
+        css=(BOOTSTRAP_CSS, FONTAWESOME_CSS),
+        js=(BOOTSTRAP_JS,),
+        font_families=('Montserrat:wght@800', 'Syne:wght@400;700'),
+        tenant_fonts=False,
+    ),
+    'editorial': ThemeAssets(
+        css=(BOOTSTRAP_CSS, FONTAWESOME_CSS),
+        js=(BOOTSTRAP_JS,),
+        font_families=('Playfair Display:ital,wght@0,700;0,900;1,400', 'Inter:wght@400;600'),
+        tenant_fonts=False,
+    ),
+    'saas': ThemeAssets(
+        css=(BOOTSTRAP_CSS, FONTAWESOME_CSS),
+        js=(BOOTSTRAP_JS,),
+        font_families=('Plus Jakarta Sans:wght@400;600;800',),
+        tenant_fonts=False,
+    ),
+}
+
+# Weights requested for tenant-chosen corporate fonts (heading and body)
+TENANT_FONT_WEIGHTS = 'wght@300;400;500;600;700;800'
+
+# Classes only ever added by Bootstrap's or AOS's JavaScript or Font
+# Awesome's own markup, which no template mentions
+SAFELIST = {
+    'show', 'showing', 'hiding', 'collapse', 'collapsing', 'active', 'fade', 'disabled',
+    'fa', 'fas', 'far', 'fab', 'fa-solid', 'fa-regular', 'fa-brands',
+    'aos-init', 'aos-animate',
+}
+
+TOKEN_RE = re.compile(r'[A-Za-z][A-Za-z0-9_-]*')
+CLASS_RE = re.compile(r'\.(-?[A-Za-z_][A-Za-z0-9_-]*)')
+# Functional pseudo-classes whose arguments don't need to match for the rule to apply
+PSEUDO_ARGS_RE = re.compile(r':(?:not|is|where|has)\([^()]*\)')
+URL_RE = re.compile(r'url\(([\'"]?)([^\'")]+)\1\)')
+CONTENT_RE = re.compile(r'content:\s*"(\\?)([^"]*)"')
+
+# At-rules whose bodies are lists of rules to purge recursively
+NESTED_AT_RULES = ('@media', '@supports', '@container', '@layer')
+
+
+def fetch(url, **kwargs):
+    response = requests.get(url, timeout=30, **kwargs)
+    response.raise_for_status()
+    return response
+
+
+# ----------------------------------------------------------------------------
+# Used classes
+# ----------------------------------------------------------------------------
+
+def get_template_tokens(theme):
+    """Every word in the theme's templates that could be a class name."""
+    tokens = set()
+    for template_dir in get_template_dirs():
+        theme_root = os.path.join(template_dir, THEMES_DIR, theme)
+        for root, _dirs, filenames in os.walk(theme_root):
+            for filename in filenames:
+                if filename.endswith('.html'):
+                    with open(os.path.join(root, filename), encoding='utf-8') as f:
+                        tokens.update(TOKEN_RE.findall(f.read()))
+    return tokens
+
+
+def collect_icon_tokens(value, tokens):
+    """Adds the words of every 'icon' / '*_icon' string in raw StreamField JSON."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if isinstance(item, str) and (key == 'icon' or key.endswith('_icon')):
+                tokens.update(TOKEN_RE.findall(item))
+            else:
+                collect_icon_tokens(item, tokens)
+    elif isinstance(value, list):
+        for item in value:
+            collect_icon_tokens(item, tokens)
+
+
+def get_content_tokens():
+    """
+    Icon classes and font families used by the current tenant: the SiteSettings
+    `*_icon` fields, icon fields of StreamField blocks and ThemeSettings fonts.
+    """
+    from wagtail.fields import StreamField
+    from wagtail.models import Page
+
+    from .models import SiteSettings, ThemeSettings
+
+    icons, fonts = set(), set()
+    icon_fields = [f.name for f in SiteSettings._meta.concrete_fields if f.name.endswith('_icon')]
+    for values in SiteSettings.objects.values(*icon_fields):
+        collect_icon_tokens(values, icons)
+
+    for page in Page.objects.specific():
+        for field in page._meta.get_fields():
+            if isinstance(field, StreamField):
+                collect_icon_tokens(list(getattr(page, field.name).raw_data), icons)
+
+    for heading_font, body_font in ThemeSettings.objects.values_list('heading_font', 'body_font'):
+        fonts.update(font for font in (heading_font, body_font) if font)
+    return icons, fonts
+
+
+# ----------------------------------------------------------------------------
+# CSS purging
+# ----------------------------------------------------------------------------
+
+def _string_end(css, i):
+    """Index just past the quoted string starting at css[i]."""
+    quote, i = css[i], i + 1
+    while css[i] != quote:
+        i += 2 if css[i] == '\\' else 1
+    return i + 1
+
+
+def parse_css(css):
+    """
+    Splits a stylesheet into a list of (prelude, body) pairs. Bodies of nested
+    at-rules (@media, @supports, ...) are parsed into lists themselves;
+    statements such as @charset have a body of None.
+    """
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    nodes = []
+    i, start, length = 0, 0, len(css)
+    while i < length:
+        char = css[i]
+        if char in '"\'':
+            i = _string_end(css, i)
+            continue
+        if char == ';' and css[start:i].strip().startswith('@'):
+            nodes.append((css[start:i].strip(), None))
+            start = i = i + 1
+            continue
+        if char == '{':
+            prelude = css[start:i].strip()
+            depth, j = 1, i + 1
+            while depth:
+                if css[j] in '"\'':
+                    j = _string_end(css, j)
+                    continue
+                if css[j] == '{':
+                    depth += 1
+                elif css[j] == '}':
+                    depth -= 1
+                j += 1
+            body = css[i + 1:j - 1]
+            if prelude.startswith(NESTED_AT_RULES):
+                body = parse_css(body)
+            nodes.append((prelude, body))
+            start = i = j
+            continue
+        i += 1
+    return nodes
+
+
+def split_selectors(prelude):
+    """Splits a selector list on top-level commas."""
+    selectors, depth, current = [], 0, ''
+    for char in prelude:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        if char == ',' and not depth:
+            selectors.append(current.strip())
+            current = ''
+        else:
+            current += char
+    selectors.append(current.strip())
+    return selectors
+
+
+def selector_is_used(selector, used):
+    return all(name in used for name in CLASS_RE.findall(PSEUDO_ARGS_RE.sub('', selector)))
+
+
+def purge_css(nodes, used):
+    """Drops selectors with a class not in `used`, and rules left with none."""
+    kept = []
+    for prelude, body in nodes:
+        if isinstance(body, list):
+            body = purge_css(body, used)
+            if body:
+                kept.append((prelude, body))
+        elif body is None or prelude.startswith('@'):
+            kept.append((prelude, body))
+        else:
+            selectors = [s for s in split_selectors(prelude) if selector_is_used(s, used)]
+            if selectors:
+                kept.append((','.join(selectors), body))
+    return kept
+
+
+def serialize_css(nodes):
+    parts = []
+    for prelude, body in nodes:
+        if body is None:
+            parts.append(f"{prelude};")
+        elif isinstance(body, list):
+            parts.append(f"{prelude}{{{serialize_css(body)}}}")
+        else:
+            parts.append(f"{prelude}{{{body.strip()}}}")
+    return ''.join(parts)
+
+
+def get_codepoints(nodes):
+    """Codepoints of the `content` glyphs left in a purged Font Awesome stylesheet."""
+    codepoints = set()
+    for _prelude, body in nodes:
+        if isinstance(body, list):
+            codepoints |= get_codepoints(body)
+        elif body:
+            for escaped, content in CONTENT_RE.findall(body):
+                if escaped:
+                    codepoints.add(int(content, 16))
+                else:
+                    codepoints.update(ord(char) for char in content)
+    return codepoints
+
+
+# ----------------------------------------------------------------------------
+# Fonts
+# ----------------------------------------------------------------------------
+
+def subset_font(data, codepoints):
+    """Subsets a woff2 font to `codepoints` when fontTools is installed."""
+    try:
+        from fontTools import subset
+        from fontTools.ttLib import TTFont
+    except ImportError:
+        return data
+
+    import io
+    font = TTFont(io.BytesIO(data))
+    subsetter = subset.Subsetter(subset.Options(flavor='woff2'))
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    output = io.BytesIO()
+    font.flavor = 'woff2'
+    font.save(output)
+    return output.getvalue()
+
+
+def vendor_fontawesome(css, codepoints, write_file):
+    """
+    Keeps only the woff2 sources of Font Awesome's @font-face rules and writes
+    those fonts, subset to the icons in use, under webfonts/.
+    """
+    def rewrite_src(match):
+        sources = [s for s in match.group(1).split(',') if 'woff2' in s]
+        return 'src:' + ','.join(sources)
+    css = re.sub(r'src:([^;}]+)', rewrite_src, css)
+
+    for font_url in sorted({url for _quote, url in URL_RE.findall(css) if url.endswith('.woff2')}):
+        filename = os.path.basename(font_url)
+        data = fetch(FONTAWESOME_WEBFONTS + filename).content
+        write_file(f"webfonts/{filename}", subset_font(data, codepoints))
+        css = css.replace(font_url, f"../webfonts/{filename}")
+    return css
+
+
+def vendor_google_fonts(families, write_file, fallback_families=()):
+    """
+    Downloads the Google Fonts CSS for `families` and the woff2 files it
+    references into fonts/, returning the CSS with local URLs.
+    """
+    css_parts = []
+    for family in families:
+        response = requests.get(
+            GOOGLE_FONTS_CSS, params={'family': family, 'display': 'swap'},
+            headers={'User-Agent': FONTS_USER_AGENT}, timeout=30,
+        )
+        if response.status_code == 400 and family in fallback_families:
+            # Not every family has every weight; take the regular face instead
+            response = fetch(GOOGLE_FONTS_CSS, params={'family': family.split(':')[0], 'display': 'swap'},
+                             headers={'User-Agent': FONTS_USER_AGENT})
+        response.raise_for_status()
+        css_parts.append(response.text)
+
+    css = '\n'.join(css_parts)
+    for _quote, font_url in set(URL_RE.findall(css)):
+        filename = re.sub(r'[^A-Za-z0-9._-]', '_', font_url.split('//', 1)[-1].split('/', 1)[-1])
+        write_file(f"fonts/{filename}", fetch(font_url).content)
+        css = css.replace(font_url, f"../fonts/{filename}")
+    return css
+
+
+# ----------------------------------------------------------------------------
+# Bundles
+# ----------------------------------------------------------------------------
+
+def build_theme_bundle(theme, content_icons=(), tenant_fonts=()):
+    """Builds the CSS and JS bundles of one theme. Returns {path: size}."""
+    assets = THEME_ASSETS[theme]
+    written = {}
+
+    def write_file(path, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        full_path = os.path.join(OUTPUT_ROOT, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'wb') as f:
+            f.write(data)
+        written[path] = len(data)
+
+    used = get_template_tokens(theme) | set(content_icons) | SAFELIST
+    css_parts = []
+
+    families = list(assets.font_families)
+    fallback_families = []
+    if assets.tenant_fonts:
+        fallback_families = [f"{font}:{TENANT_FONT_WEIGHTS}" for font in sorted(tenant_fonts)]
+        families += [f for f in fallback_families if f not in families]
+    css_parts.append(vendor_google_fonts(families, write_file, fallback_families))
+
+    for url in assets.css:
+        nodes = purge_css(parse_css(fetch(url).text), used)
+        css = serialize_css(nodes)
+        if url == FONTAWESOME_CSS:
+            css = vendor_fontawesome(css, get_codepoints(nodes), write_file)
+        css_parts.append(css)
+
+    write_file(f"{theme}/bundle.css", '\n'.join(css_parts))
+    write_file(f"{theme}/bundle.js", ';\n'.join(fetch(url).text for url in assets.js))
+    return written
+
+
+_bundles = LocalCache(maxsize=64, ttl=BUNDLE_CHECK_INTERVAL)
+
+
+def find_bundle(theme, kind):
+    """
+    (static path, file path, mtime) of a built theme bundle, or None if it
+    hasn't been built.
+    """
+    key = (theme, kind)
+    found = _bundles.get(key, False)
+    if found is False:
+        path = f"{BUNDLE_DIR}/{theme}/bundle.{kind}"
+        file_path = finders.find(path)
+        found = (path, file_path, os.stat(file_path).st_mtime_ns) if file_path else None
+        _bundles.set(key, found)
+    return found
+
+
+def get_bundle_path(theme, kind):
+    """Static path of a built theme bundle, or None if it hasn't been built."""
+    found = find_bundle(theme, kind)
+    return found[0] if found else None
@@ -1,6 +1,22 @@
 from wagtail import blocks
-from wagtail.images.blocks import ImageChooserBlock
-from wagtail.documents.blocks import DocumentChooserBlock
+
+from .prefetch import DocumentChooserBlock, ImageChooserBlock
+
+
+def get_path_content(block, value, path):
+    """
+    Searchable text of the child at a dotted `path` below a block value;
+    ListBlocks contribute the path's value of every item.
+    """
+    if value in (None, ''):
+        return []
+    if isinstance(block, blocks.ListBlock):
+        return [text for item in value for text in get_path_content(block.child_block, item, path)]
+    if not path:
+        return block.get_searchable_content(value)
+    name, *rest = path
+    return get_path_content(block.child_blocks[name], value.get(name), rest)
+
 
 class BaseBlock(blocks.StructBlock):
     variant = blocks.ChoiceBlock(choices=[
@@ -28,41 +44,27 @@ class BaseBlock(blocks.StructBlock):
         required=False, default=True, help_text="Toggle this section ON/OFF")
 
     def get_template(self, value, context=None):
-        from django.template.loader import select_template
-        from pages.models import ThemeSettings
-        
-        request = context.get('request') if context else None
-        site = getattr(request, 'site', None) if request else None
-        
-        if not site:
-            from wagtail.models import Site
-            site = Site.objects.get(is_default_site=True)
-
-        config = ThemeSettings.for_site(site)
+        from pages.theme import get_theme_resolver
 
-        theme = config.base_theme if config else 'modern'
+        request = context.get('request') if context else None
         block_name = getattr(self.meta, 'block_name', 'default')
-        
-        config_variant = getattr(config, f"{block_name}_variant", 'v1') if config else 'v1'
-        variant = value.get('variant', config_variant)
-        if variant == 'v1' and config_variant != 'v1':
-            variant = config_variant
-            
-        templates = [
-            f"themes/{theme}/blocks/{block_name}/{variant}.html",
-            f"themes/{theme}/blocks/{block_name}/v1.html",
-            f"themes/modern/blocks/{block_name}/v1.html",
-        ]
-        
-        import os
-        from django.conf import settings
-        
-        for t in templates:
-            for template_dir in settings.TEMPLATES[0]['DIRS']:
-                if os.path.exists(os.path.join(template_dir, t)):
-                    return t
-        
-        return templates[0]
+        return get_theme_resolver(request).block_template(block_name, value)
+
+    def get_searchable_content(self, value):
+        """
+        Only the text visitors read, as listed in Meta.search_fields (dotted
+        paths into list items), so variants, animations, icon classes and
+        links stay out of the search index. Hidden sections aren't indexed.
+        """
+        search_fields = getattr(self.meta, 'search_fields', None)
+        if search_fields is None:
+            return super().get_searchable_content(value)
+        if value.get('visible') is False:
+            return []
+        content = []
+        for path in search_fields:
+            content.extend(get_path_content(self, value, path.split('.')))
+        return content
 
     class Meta:
         abstract = True
@@ -85,6 +87,8 @@ class HeroBlock(BaseBlock):
 
     class Meta:
         block_name = "hero"
+        rendition_role = "hero"
+        search_fields = ('title', 'subtitle', 'badge_text')
         icon = "title"
         label = "Hero Section"
 
@@ -119,6 +123,7 @@ class CarouselHeroBlock(BaseBlock):
 
     class Meta:
         block_name = "carousel_hero"
+        search_fields = ('slides.title', 'slides.subtitle', 'slides.badge_text')
         icon = "image"
         label = "Carousel Hero"
 
@@ -133,6 +138,8 @@ class AboutBlock(BaseBlock):
 
     class Meta:
         block_name = "about"
+        rendition_role = "about"
+        search_fields = ('title', 'content')
         icon = "user"
         label = "About Section"
 
@@ -150,6 +157,7 @@ class ServicesBlock(BaseBlock):
 
     class Meta:
         block_name = "services"
+        search_fields = ('title', 'subtitle', 'services.name', 'services.description')
         icon = "list-ul"
         label = "Services Grid"
 
@@ -167,6 +175,7 @@ class WhyChooseUsBlock(BaseBlock):
 
     class Meta:
         block_name = "why_choose_us"
+        search_fields = ('title', 'subtitle', 'reasons.title', 'reasons.description')
         icon = "tick-inverse"
         label = "Why Choose Us"
 
@@ -181,6 +190,7 @@ class IndustriesBlock(BaseBlock):
 
     class Meta:
         block_name = "industries"
+        search_fields = ('title', 'subtitle', 'industries.name')
         icon = "globe"
         label = "Industries We Serve"
 
@@ -195,6 +205,7 @@ class ProcessStepsBlock(BaseBlock):
 
     class Meta:
         block_name = "process_steps"
+        search_fields = ('title', 'subtitle', 'steps.title', 'steps.description')
         icon = "order"
         label = "Process Steps"
 
@@ -208,6 +219,7 @@ class TrustBarBlock(BaseBlock):
 
     class Meta:
         block_name = "trust_bar"
+        search_fields = ('title', 'logos.name')
         icon = "group"
         label = "Trust / Certification Bar"
 
@@ -228,6 +240,8 @@ class TestimonialsBlock(BaseBlock):
 
     class Meta:
         block_name = "testimonials"
+        search_fields = ('title', 'testimonials.quote', 'testimonials.author', 'testimonials.location')
+        lazy_load = True
         icon = "openquote"
         label = "Testimonials"
 
@@ -243,6 +257,8 @@ class SuccessStoryBlock(BaseBlock):
 
     class Meta:
         block_name = "success_story"
+        search_fields = ('title', 'stories.client_name', 'stories.story_title', 'stories.summary')
+        lazy_load = True
         icon = "success"
         label = "Success Stories"
 
@@ -256,6 +272,8 @@ class PartnerBlock(BaseBlock):
 
     class Meta:
         block_name = "partners"
+        search_fields = ('title', 'partners.name')
+        lazy_load = True
         icon = "group"
         label = "Partners"
 
@@ -273,6 +291,7 @@ class CTABlock(BaseBlock):
 
     class Meta:
         block_name = "cta"
+        search_fields = ('title', 'subtitle')
         icon = "bullhorn"
         label = "CTA Banner"
 
@@ -287,6 +306,7 @@ class FinalCTABlock(BaseBlock):
 
     class Meta:
         block_name = "final_cta"
+        search_fields = ('title', 'subtitle')
         icon = "pick"
         label = "Final Conversion Block"
 
@@ -307,6 +327,8 @@ class LeadFormBlock(BaseBlock):
 
     class Meta:
         block_name = "lead_form"
+        renders_form = True
+        search_fields = ('title', 'subtitle')
         icon = "mail"
         label = "Lead Capture Form"
 
@@ -319,6 +341,8 @@ class LeadMagnetBlock(BaseBlock):
 
     class Meta:
         block_name = "lead_magnet"
+        renders_form = True
+        search_fields = ('title', 'subtitle', 'offer_text')
         icon = "pick"
         label = "Lead Magnet"
 
@@ -337,6 +361,7 @@ class FAQBlock(BaseBlock):
 
     class Meta:
         block_name = "faq"
+        search_fields = ('title', 'items.question', 'items.answer')
         icon = "help"
         label = "FAQ Accordion"
 
@@ -346,6 +371,8 @@ class GalleryBlock(BaseBlock):
 
     class Meta:
         block_name = "gallery"
+        search_fields = ('title',)
+        lazy_load = True
         icon = "image"
         label = "Gallery"
 
@@ -355,5 +382,6 @@ class DocumentBlock(BaseBlock):
 
     class Meta:
         block_name = "document"
+        search_fields = ('title',)
         icon = "doc-full"
         label = "Document Download"
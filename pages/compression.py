@@ -0,0 +1,107 @@
+"""
+HTML minification and precompressed page variants.
+
+Pages stored in the page cache are minified (indentation, blank lines and
+comments removed, inline <style> collapsed; <pre>, <textarea> and <script>
+left untouched) and compressed once with Brotli and gzip. Cache hits are then
+answered with the stored bytes of whichever encoding the client accepts, so
+compression costs nothing per request. Brotli needs the `Brotli` package;
+without it only gzip variants are stored.
+"""
+import gzip
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+HTML_MINIFY_ENABLED = getattr(settings, 'HTML_MINIFY_ENABLED', False)
+
+# Don't bother compressing responses smaller than this
+MIN_COMPRESS_LENGTH = 200
+
+# Variants are compressed by the request that fills the cache, and a
+# generation bump makes every page's next visitor do that, so these levels
+# trade a few percent of size for compressing several times faster than
+# the maximum ones
+BROTLI_QUALITY = 5
+GZIP_LEVEL = 6
+
+PRESERVED_RE = re.compile(r'(<(pre|textarea|script|style)\b.*?</\2\s*>)', re.S | re.I)
+# Conditional comments are kept
+COMMENT_RE = re.compile(r'<!--(?!\[if).*?-->', re.S)
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def _collapse(match):
+    # Whitespace that contains a newline is significant between inline
+    # elements, so it's kept as one newline rather than removed
+    return '\n' if '\n' in match.group(0) else ' '
+
+
+def minify_html(html):
+    """Collapses whitespace and strips comments outside whitespace-sensitive elements."""
+    parts = PRESERVED_RE.split(html)
+    output = []
+    # re.split with two groups yields [text, element, tag name, text, ...]
+    for i in range(0, len(parts), 3):
+        output.append(WHITESPACE_RE.sub(_collapse, COMMENT_RE.sub('', parts[i])))
+        if i + 1 < len(parts):
+            element = parts[i + 1]
+            if parts[i + 2].lower() == 'style':
+                element = WHITESPACE_RE.sub(' ', element)
+            output.append(element)
+    return ''.join(output).strip()
+
+
+def compress_variants(content):
+    """{'br': bytes, 'gzip': bytes} for `content`, skipping encodings that don't pay off."""
+    variants = {}
+    if len(content) < MIN_COMPRESS_LENGTH:
+        return variants
+    if brotli is not None:
+        variants['br'] = brotli.compress(content, mode=brotli.MODE_TEXT, quality=BROTLI_QUALITY)
+    variants['gzip'] = gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0)
+    return {encoding: data for encoding, data in variants.items() if len(data) < len(content)}
+
+
+def accepted_encodings(request):
+    """Content codings the client accepts, ignoring any it lists with q=0."""
+    accepted = set()
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = item.strip().partition(';')
+        if re.match(r'^\s*q\s*=\s*0(\.0*)?\s*$', params):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def choose_encoding(request, variants):
+    accepted = accepted_encodings(request)
+    for encoding in ('br', 'gzip'):
+        if encoding in variants and (encoding in accepted or '*' in accepted):
+            return encoding
+    return None
+
+
+def apply_encoding(response, request, variants):
+    """
+    Replaces the response body with the best precompressed variant the
+    client accepts. Strong ETags become weak, as the bytes now differ per
+    encoding.
+    """
+    patch_vary_headers(response, ('Accept-Encoding',))
+    encoding = choose_encoding(request, variants)
+    if encoding is None:
+        return response
+    response.content = variants[encoding]
+    response['Content-Encoding'] = encoding
+    response['Content-Length'] = str(len(response.content))
+    etag = response.get('ETag')
+    if etag and not etag.startswith('W/'):
+        response['ETag'] = f"W/{etag}"
+    return response
@@ -0,0 +1,181 @@
+"""
+Critical CSS per theme and page type.
+
+With a theme's asset bundle built (see pages.assets) and the site's
+stylesheet compiled (see pages.stylesheets), base templates inline only the
+rules the first screen needs and load both stylesheets asynchronously. The
+first screen is approximated by the theme's header (base.html up to
+`{% block content %}`), the page type's template and the hero block, the
+section every page opens with; the bundle and stylesheet are purged down to
+the classes those templates use.
+
+Results are built by `manage.py build_critical_css` and stored in
+default_storage under a fingerprint of the theme manifest version, the
+bundle contents, the stylesheet name (which carries its own content hash)
+and the page template. Requests only ever read them: after editing a theme
+template, rebuilding a bundle or saving ThemeSettings, pages link the full
+stylesheets until the command has been run again.
+"""
+import hashlib
+import logging
+import os
+import posixpath
+import re
+from functools import lru_cache
+from urllib.parse import urljoin
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.templatetags.static import static
+from django.urls import reverse
+
+from core.cache import LocalCache, tenant_key
+
+from .assets import SAFELIST, TOKEN_RE, URL_RE, find_bundle, parse_css, purge_css, serialize_css
+from .stylesheets import get_theme_stylesheet_name, stylesheet_path
+from .theme_manifest import THEMES_DIR, get_template_dirs, manifest
+
+logger = logging.getLogger(__name__)
+
+CRITICAL_CSS_DIR = 'critical-css'
+
+# Blocks rendered above the fold on every page type
+ABOVE_THE_FOLD_BLOCKS = ('hero',)
+
+_local = LocalCache(maxsize=256, ttl=3600)
+# Critical CSS that hasn't been built yet is looked for again after this long
+_missing = LocalCache(maxsize=256, ttl=60)
+
+
+def read_template_source(name):
+    for template_dir in get_template_dirs():
+        path = os.path.join(template_dir, name)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8-sig') as f:
+                return f.read()
+    return ''
+
+
+def get_above_the_fold_sources(theme, page_template):
+    """Template sources making up the first screen of a page type in a theme."""
+    base = read_template_source(f"{THEMES_DIR}/{theme}/base.html")
+    sources = [base.split('{% block content %}')[0], read_template_source(page_template)]
+    for block_name in ABOVE_THE_FOLD_BLOCKS:
+        prefix = f"{THEMES_DIR}/{theme}/blocks/{block_name}/"
+        sources += [read_template_source(name) for name in sorted(manifest.templates) if name.startswith(prefix)]
+    return sources
+
+
+def absolutize_urls(css, base_url):
+    """Resolves relative url()s against the stylesheet's URL so the CSS can be inlined."""
+    def resolve(match):
+        quote, url = match.groups()
+        if re.match(r'^([a-z][a-z0-9+.-]*:|/|#)', url, re.I):
+            return match.group(0)
+        return f"url({quote}{urljoin(base_url, url)}{quote})"
+    return URL_RE.sub(resolve, css)
+
+
+@lru_cache(maxsize=64)
+def _file_digest(file_path, mtime):
+    with open(file_path, 'rb') as f:
+        return hashlib.md5(f.read()).hexdigest()[:12]
+
+
+def get_bundle_digest(theme):
+    """Content hash of a theme's CSS bundle, or None if it hasn't been built."""
+    found = find_bundle(theme, 'css')
+    if found is None:
+        return None
+    _path, file_path, mtime = found
+    # Keyed on the mtime, so a rebuilt bundle is hashed again
+    return _file_digest(file_path, mtime)
+
+
+def read_sources(theme, stylesheet_name):
+    """(css, url) of the theme bundle and the compiled site stylesheet."""
+    bundle_path, file_path, _mtime = find_bundle(theme, 'css')
+    with open(file_path, encoding='utf-8') as f:
+        bundle_css = f.read()
+    with default_storage.open(stylesheet_path(stylesheet_name)) as f:
+        site_css = f.read().decode('utf-8')
+    return [
+        (bundle_css, static(bundle_path)),
+        (site_css, reverse('theme_stylesheet', args=[stylesheet_name])),
+    ]
+
+
+def extract_critical_css(theme, page_template, stylesheet_name):
+    used = set(SAFELIST)
+    for source in get_above_the_fold_sources(theme, page_template):
+        used.update(TOKEN_RE.findall(source))
+    parts = []
+    for css, url in read_sources(theme, stylesheet_name):
+        parts.append(absolutize_urls(serialize_css(purge_css(parse_css(css), used)), url))
+    return ''.join(parts)
+
+
+def critical_css_path(theme, page_template, stylesheet_name):
+    """
+    Storage path of the critical CSS for a page type, or None when the theme
+    bundle isn't built (pages then keep linking the full stylesheets).
+    """
+    bundle_digest = get_bundle_digest(theme)
+    if bundle_digest is None or not stylesheet_name:
+        return None
+    fingerprint = hashlib.md5(
+        f"{theme}:{page_template}:{manifest.version}:{bundle_digest}:{stylesheet_name}".encode('utf-8')
+    ).hexdigest()[:16]
+    return posixpath.join(CRITICAL_CSS_DIR, connection.schema_name, f"{fingerprint}.css")
+
+
+def build_critical_css(config, page_template):
+    """
+    Extracts and stores the critical CSS for a page type on `config`'s site
+    unless it's already stored. Returns it, or '' when the theme bundle or
+    site stylesheet isn't built.
+    """
+    stylesheet_name = get_theme_stylesheet_name(config)
+    path = critical_css_path(config.base_theme, page_template, stylesheet_name)
+    if path is None:
+        return ''
+    if default_storage.exists(path):
+        with default_storage.open(path) as f:
+            return f.read().decode('utf-8')
+    css = extract_critical_css(config.base_theme, page_template, stylesheet_name)
+    default_storage.save(path, ContentFile(css.encode('utf-8')))
+    return css
+
+
+def get_critical_css(config, page_template):
+    """
+    The stored critical CSS for a page type on `config`'s site, or '' when
+    build_critical_css hasn't built it.
+    """
+    if config is None or not page_template:
+        return ''
+    stylesheet_name = get_theme_stylesheet_name(config)
+    path = critical_css_path(config.base_theme, page_template, stylesheet_name)
+    if path is None:
+        return ''
+
+    key = tenant_key(path)
+    css = _local.get(key)
+    if css is not None:
+        return css
+    if _missing.get(key):
+        return ''
+
+    try:
+        with default_storage.open(path) as f:
+            css = f.read().decode('utf-8')
+    except FileNotFoundError:
+        _missing.set(key, True)
+        return ''
+    except Exception:
+        logger.exception("Could not read the critical CSS of %s for site %s", page_template, config.site_id)
+        _missing.set(key, True)
+        return ''
+    _local.set(key, css)
+    return css
@@ -0,0 +1,77 @@
+"""
+Rendered-HTML cache for individual StreamField sections.
+
+A section's HTML depends only on its value, the resolved theme and variant and
+the theme templates, so the key combines the block id and type, theme,
+variant, a hash of the block's stored value and the theme manifest version
+(tenant schema is added by the cache KEY_FUNCTION). Editing one section only
+re-renders that section, and unchanged blocks carried over between revisions
+keep hitting the cache. Sections also render links to other pages (menus,
+page choosers, rich text), so keys embed the 'pages' generation too, and
+moving, renaming or unpublishing any page drops them.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.safestring import mark_safe
+
+from core.cache import get_generations
+
+from .theme import get_theme_resolver
+from .theme_manifest import manifest
+
+FRAGMENT_CACHE_ENABLED = getattr(settings, 'FRAGMENT_CACHE_ENABLED', False)
+FRAGMENT_CACHE_TIMEOUT = getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def block_content_hash(child):
+    prep_value = child.block.get_prep_value(child.value)
+    payload = json.dumps(prep_value, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.md5(payload.encode('utf-8')).hexdigest()
+
+
+def get_content_generation(request):
+    """The 'pages' generation, looked up once per request."""
+    # page_cache imports this module (through pages.streaming)
+    from .page_cache import CONTENT_GENERATION
+
+    generation = getattr(request, '_content_generation', None)
+    if generation is None:
+        generation = get_generations(CONTENT_GENERATION)[CONTENT_GENERATION]
+        if request is not None:
+            request._content_generation = generation
+    return generation
+
+
+def fragment_cache_key(child, resolver, generation):
+    block_name = getattr(child.block.meta, 'block_name', None)
+    variant = resolver.block_variant(block_name, child.value) if block_name else ''
+    return "fragment:{}:{}:{}:{}:{}:{}:{}".format(
+        child.id, child.block_type, resolver.theme, variant,
+        block_content_hash(child), manifest.version, generation,
+    )
+
+
+def render_stream_child(child, context):
+    """Renders a StreamField child the way {% include_block %} does."""
+    return child.render_as_block(context=context.flatten())
+
+
+def render_cached_fragment(child, context):
+    """Renders a StreamField child, serving its HTML from the fragment cache."""
+    if not FRAGMENT_CACHE_ENABLED or not getattr(child, 'id', None):
+        return render_stream_child(child, context)
+
+    request = context.get('request')
+    if getattr(request, 'is_preview', False):
+        return render_stream_child(child, context)
+
+    key = fragment_cache_key(child, get_theme_resolver(request), get_content_generation(request))
+    html = cache.get(key)
+    if html is None:
+        html = render_stream_child(child, context)
+        cache.set(key, str(html), FRAGMENT_CACHE_TIMEOUT)
+    return mark_safe(html)
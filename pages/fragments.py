@@ -0,0 +1,100 @@
+"""
+Hidden and lazily loaded page sections.
+
+Sections switched off with their `visible` toggle are left out of the page
+altogether instead of being rendered and hidden with CSS, so they cost
+neither template nor image work.
+
+Heavy below-the-fold blocks set `lazy_load = True` in their Meta. With
+LAZY_SECTIONS_ENABLED they render as a placeholder that fetches the section
+from `/_fragments/<page id>/<block id>/` when it scrolls into view; base
+templates include the script that does so once per page that has any. That
+endpoint renders the one section through the fragment cache and answers
+with the page's validators, so browsers and proxies can keep it.
+"""
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from .fragment_cache import render_cached_fragment
+
+LAZY_SECTIONS_ENABLED = getattr(settings, 'LAZY_SECTIONS_ENABLED', False)
+FRAGMENT_MAX_AGE = getattr(settings, 'FRAGMENT_MAX_AGE', 60 * 5)
+
+LAZY_SECTIONS_SCRIPT = 'pages/js/lazy-sections.js'
+
+
+def is_visible(raw_child):
+    value = raw_child.get('value')
+    return not (isinstance(value, dict) and value.get('visible') is False)
+
+
+def visible_blocks(stream_value):
+    """
+    The visible children of a StreamValue. Visibility is read from the raw
+    data, so hidden children are never rendered.
+    """
+    raw_data = stream_value.raw_data
+    return [stream_value[i] for i in range(len(raw_data)) if is_visible(raw_data[i])]
+
+
+def find_block(stream_value, block_id):
+    """The visible child of a StreamValue with the given id, or None."""
+    raw_data = stream_value.raw_data
+    for i in range(len(raw_data)):
+        if raw_data[i].get('id') == block_id and is_visible(raw_data[i]):
+            return stream_value[i]
+    return None
+
+
+def is_lazy(child, context):
+    if not LAZY_SECTIONS_ENABLED or context.get('rendering_fragment'):
+        return False
+    request = context.get('request')
+    page = context.get('page')
+    return (
+        getattr(child.block.meta, 'lazy_load', False)
+        and bool(getattr(child, 'id', None))
+        and getattr(page, 'pk', None) is not None
+        and not getattr(request, 'is_preview', False)
+    )
+
+
+def render_section(child, context):
+    """Renders a page section, or its placeholder when it loads lazily."""
+    if is_lazy(child, context):
+        return render_to_string('pages/fragments/placeholder.html', {
+            'url': reverse('section_fragment', args=[context['page'].pk, child.id]),
+            'block_type': child.block_type,
+        })
+    return render_cached_fragment(child, context)
+
+
+def has_lazy_sections(page, request):
+    """
+    Whether any visible section of `page` renders as a placeholder. Read from
+    the raw stream data, as streamed pages render the end of <body> before
+    their sections.
+    """
+    from wagtail.fields import StreamField
+
+    if (
+        not LAZY_SECTIONS_ENABLED
+        or getattr(page, 'pk', None) is None
+        or getattr(request, 'is_preview', False)
+    ):
+        return False
+    for field in page._meta.get_fields():
+        if not isinstance(field, StreamField):
+            continue
+        child_blocks = field.stream_block.child_blocks
+        for raw_child in getattr(page, field.name).raw_data:
+            block = child_blocks.get(raw_child.get('type'))
+            if (
+                block is not None
+                and getattr(block.meta, 'lazy_load', False)
+                and raw_child.get('id')
+                and is_visible(raw_child)
+            ):
+                return True
+    return False
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django_tenants.utils import get_public_schema_name, get_tenant_model, schema_context
+from wagtail.models import Page
+
+from pages.critical_css import build_critical_css
+from pages.models import ThemeSettings
+from pages.theme_manifest import THEMES_DIR
+
+
+class Command(BaseCommand):
+    help = 'Precomputes the critical CSS of every site for each page type it uses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schema', action='append', dest='schemas',
+                            help='Tenant schema to build (repeatable). Defaults to every tenant.')
+
+    def handle(self, *args, **options):
+        schemas = options['schemas'] or list(
+            get_tenant_model().objects.exclude(schema_name=get_public_schema_name())
+            .values_list('schema_name', flat=True)
+        )
+
+        built = skipped = failed = 0
+        for schema_name in schemas:
+            with schema_context(schema_name):
+                page_templates = {
+                    page.specific_class.theme_template
+                    for page in Page.objects.live().exclude(depth=1)
+                    if getattr(page.specific_class, 'theme_template', None)
+                }
+                for config in ThemeSettings.objects.select_related('site'):
+                    for template_name in sorted(page_templates):
+                        page_template = f"{THEMES_DIR}/{config.base_theme}/pages/{template_name}"
+                        try:
+                            css = build_critical_css(config, page_template)
+                        except Exception as e:
+                            failed += 1
+                            self.stdout.write(self.style.ERROR(f'[{schema_name}] {config.site} {template_name}: {e}'))
+                            continue
+                        if css:
+                            built += 1
+                            self.stdout.write(f'[{schema_name}] {config.site} {template_name}: '
+                                              f'{len(css) / 1024:.1f} KiB')
+                        else:
+                            skipped += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Done: {built} critical stylesheets ready, {failed} failed, {skipped} skipped '
+            f'(theme bundle not built or site stylesheet not compiled).'
+        ))
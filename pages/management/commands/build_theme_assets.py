@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django_tenants.utils import get_public_schema_name, get_tenant_model, schema_context
+
+from pages.assets import THEME_ASSETS, build_theme_bundle, get_content_tokens
+
+
+class Command(BaseCommand):
+    help = 'Builds the self-hosted, purged CSS/JS bundles of each theme into pages/static/theme-bundles/'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--theme', action='append', dest='themes', choices=sorted(THEME_ASSETS),
+                            help='Theme to build (repeatable). Defaults to every theme.')
+        parser.add_argument('--schema', action='append', dest='schemas',
+                            help='Tenant schema whose content icons and fonts to keep (repeatable). '
+                                 'Defaults to every tenant.')
+
+    def handle(self, *args, **options):
+        schemas = options['schemas'] or list(
+            get_tenant_model().objects.exclude(schema_name=get_public_schema_name())
+            .values_list('schema_name', flat=True)
+        )
+
+        icons, fonts = set(), set()
+        for schema_name in schemas:
+            with schema_context(schema_name):
+                schema_icons, schema_fonts = get_content_tokens()
+            icons |= schema_icons
+            fonts |= schema_fonts
+        self.stdout.write(f'{len(icons)} icon classes and {len(fonts)} tenant fonts in use '
+                          f'across {len(schemas)} tenants')
+
+        for theme in options['themes'] or sorted(THEME_ASSETS):
+            try:
+                written = build_theme_bundle(theme, icons, fonts)
+            except Exception as e:
+                raise CommandError(f'Building the {theme} bundle failed: {e}')
+            for path, size in sorted(written.items()):
+                self.stdout.write(f'[{theme}] {path}: {size / 1024:.1f} KiB')
+
+        self.stdout.write(self.style.SUCCESS(
+            'Done. Run collectstatic (and compress, when offline compression is on) to publish the bundles.'
+        ))
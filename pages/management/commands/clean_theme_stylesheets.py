@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django_tenants.utils import get_public_schema_name, get_tenant_model, schema_context
+
+from pages.models import ThemeSettings
+from pages.stylesheets import STYLESHEET_NAME_RE, compiled_name_key, stylesheet_path
+
+
+class Command(BaseCommand):
+    help = 'Deletes compiled theme stylesheets no site has used for the grace period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schema', action='append', dest='schemas',
+                            help='Tenant schema to clean (repeatable). Defaults to every schema.')
+        parser.add_argument('--grace-days', type=int, default=14,
+                            help='Keep unused stylesheets this many days after they were compiled, '
+                                 'as cached pages may still link them (default 14).')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='List the stylesheets that would be deleted.')
+
+    def handle(self, *args, **options):
+        public_schema = get_public_schema_name()
+        schemas = options['schemas'] or [public_schema] + list(
+            get_tenant_model().objects.exclude(schema_name=public_schema)
+            .values_list('schema_name', flat=True)
+        )
+        cutoff = timezone.now() - timedelta(days=options['grace_days'])
+
+        deleted = 0
+        for schema_name in schemas:
+            try:
+                _, files = default_storage.listdir(stylesheet_path('', schema_name))
+            except FileNotFoundError:
+                continue
+            with schema_context(schema_name):
+                in_use = set()
+                for config in ThemeSettings.objects.exclude(stylesheet_name=''):
+                    in_use.add(config.stylesheet_name)
+                    in_use.add(cache.get(compiled_name_key(config)))
+
+            for name in files:
+                if not STYLESHEET_NAME_RE.match(name) or name in in_use:
+                    continue
+                path = stylesheet_path(name, schema_name)
+                if default_storage.get_modified_time(path) > cutoff:
+                    continue
+                if not options['dry_run']:
+                    default_storage.delete(path)
+                deleted += 1
+                self.stdout.write(f'[{schema_name}] {name}')
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {deleted} unused stylesheets.'))
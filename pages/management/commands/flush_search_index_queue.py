@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django_tenants.utils import get_public_schema_name, get_tenant_model, schema_context
+
+from pages.search_index import SEARCH_INDEX_BATCH_SIZE, drain_index_queue, get_index_lag
+
+
+class Command(BaseCommand):
+    help = "Applies every queued search index update now and reports each tenant's indexing lag"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schema', action='append', dest='schemas',
+                            help='Schema to flush (repeatable). Defaults to the public schema and every tenant.')
+        parser.add_argument('--batch-size', type=int, default=SEARCH_INDEX_BATCH_SIZE,
+                            help=f'Objects indexed per batch (default {SEARCH_INDEX_BATCH_SIZE}).')
+        parser.add_argument('--status', action='store_true',
+                            help='Only report queued objects and lag, without indexing.')
+
+    def handle(self, *args, **options):
+        public = get_public_schema_name()
+        tenants = get_tenant_model().objects.exclude(schema_name=public)
+        schemas = options['schemas'] or [public, *tenants.values_list('schema_name', flat=True)]
+        unknown = set(schemas) - {public} - set(
+            tenants.filter(schema_name__in=schemas).values_list('schema_name', flat=True)
+        )
+        if unknown:
+            raise CommandError(f"Unknown tenant schema(s): {', '.join(sorted(unknown))}")
+
+        total_failed = 0
+        for schema_name in schemas:
+            with schema_context(schema_name):
+                if options['status']:
+                    queued, lag, exhausted = get_index_lag()
+                    self.stdout.write(
+                        f'[{schema_name}] {queued} queued, lag {lag:.1f}s, {exhausted} given up after retries'
+                    )
+                    continue
+                indexed, removed, failed = drain_index_queue(options['batch_size'])
+                _queued, _lag, exhausted = get_index_lag()
+            total_failed += exhausted
+            self.stdout.write(f'[{schema_name}] {indexed} indexed, {removed} removed, {failed} failed')
+
+        if options['status']:
+            return
+        if total_failed:
+            raise CommandError(
+                f'{total_failed} objects could not be indexed; fix the errors logged above and run '
+                'rebuild_search_index.'
+            )
+        self.stdout.write(self.style.SUCCESS(f'Done: search index queues of {len(schemas)} schemas flushed.'))
@@ -0,0 +1,54 @@
+from concurrent.futures import as_completed
+
+from django.core.management.base import BaseCommand
+from django_tenants.utils import get_public_schema_name, get_tenant_model, schema_context
+from wagtail.models import Page
+
+from pages.models import SiteSettings, ThemeSettings
+from pages.rendition_queue import (
+    RENDITION_WORKERS, generate_renditions, get_page_rendition_items, get_page_theme,
+    get_settings_rendition_items, make_executor,
+)
+
+
+class Command(BaseCommand):
+    help = 'Generates the responsive image renditions of every live page and site setting'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schema', action='append', dest='schemas',
+                            help='Tenant schema to backfill (repeatable). Defaults to every tenant.')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Worker processes (defaults to RENDITION_WORKERS).')
+
+    def handle(self, *args, **options):
+        schemas = options['schemas'] or list(
+            get_tenant_model().objects.exclude(schema_name=get_public_schema_name())
+            .values_list('schema_name', flat=True)
+        )
+
+        work = set()
+        for schema_name in schemas:
+            with schema_context(schema_name):
+                items = set()
+                for page in Page.objects.live().specific():
+                    items |= get_page_rendition_items(page, get_page_theme(page))
+                for theme_settings in ThemeSettings.objects.all():
+                    items |= get_settings_rendition_items(theme_settings=theme_settings)
+                for site_settings in SiteSettings.objects.all():
+                    items |= get_settings_rendition_items(site_settings=site_settings)
+            work |= {(schema_name, *item) for item in items}
+            self.stdout.write(f'[{schema_name}] {len(items)} image rendition jobs queued')
+
+        generated = failed = 0
+        with make_executor(options['workers'] or RENDITION_WORKERS or 1) as executor:
+            futures = {executor.submit(generate_renditions, *item): item for item in work}
+            for future in as_completed(futures):
+                try:
+                    generated += future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(f'{futures[future]}: {e}'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Done: {generated} renditions ensured across {len(work)} jobs, {failed} failed.'
+        ))
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django_tenants.utils import get_public_schema_name, get_tenant_model, schema_context
+
+from pages.search_index import SEARCH_INDEX_BATCH_SIZE, get_index_lag, process_index_queue
+
+
+class Command(BaseCommand):
+    help = "Applies queued search index updates of every tenant in batches, polling until stopped"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schema', action='append', dest='schemas',
+                            help='Schema to process (repeatable). Defaults to the public schema and every tenant.')
+        parser.add_argument('--batch-size', type=int, default=SEARCH_INDEX_BATCH_SIZE,
+                            help=f'Objects indexed per batch (default {SEARCH_INDEX_BATCH_SIZE}).')
+        parser.add_argument('--interval', type=float, default=2,
+                            help='Seconds to sleep when every queue is empty (default 2).')
+        parser.add_argument('--once', action='store_true',
+                            help='Process one batch per tenant and exit.')
+
+    def handle(self, *args, **options):
+        while True:
+            busy = False
+            public = get_public_schema_name()
+            schemas = options['schemas'] or [
+                public, *get_tenant_model().objects.exclude(schema_name=public).values_list('schema_name', flat=True),
+            ]
+            for schema_name in schemas:
+                with schema_context(schema_name):
+                    indexed, removed, failed = process_index_queue(options['batch_size'])
+                    if not (indexed or removed or failed):
+                        continue
+                    busy = True
+                    queued, lag, _exhausted = get_index_lag()
+                self.stdout.write(
+                    f'[{schema_name}] {indexed} indexed, {removed} removed, {failed} failed; '
+                    f'{queued} queued, lag {lag:.1f}s'
+                )
+            if options['once']:
+                return
+            if not busy:
+                time.sleep(options['interval'])
@@ -0,0 +1,52 @@
+from concurrent.futures import as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django_tenants.utils import get_public_schema_name, get_tenant_model
+
+from pages.search_index import make_executor, rebuild_tenant_index
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the Postgres full-text search index of the public schema and one or every tenant, in parallel"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schema', action='append', dest='schemas',
+                            help='Schema to rebuild (repeatable). Defaults to the public schema and every tenant.')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Tenants rebuilt at once (default 4).')
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help='Objects indexed per batch (default 1000).')
+
+    def handle(self, *args, **options):
+        # The public schema holds the index of shared models (images, documents)
+        public = get_public_schema_name()
+        tenants = get_tenant_model().objects.exclude(schema_name=public)
+        schemas = options['schemas'] or [public, *tenants.values_list('schema_name', flat=True)]
+        unknown = set(schemas) - {public} - set(
+            tenants.filter(schema_name__in=schemas).values_list('schema_name', flat=True)
+        )
+        if unknown:
+            raise CommandError(f"Unknown tenant schema(s): {', '.join(sorted(unknown))}")
+
+        failed = []
+        workers = max(1, min(options['workers'], len(schemas) or 1))
+        with make_executor(workers) as executor:
+            futures = {
+                executor.submit(rebuild_tenant_index, schema_name, options['chunk_size']): schema_name
+                for schema_name in schemas
+            }
+            for future in as_completed(futures):
+                schema_name = futures[future]
+                try:
+                    output, seconds = future.result()
+                except Exception as e:
+                    failed.append(schema_name)
+                    self.stdout.write(self.style.ERROR(f'[{schema_name}] failed: {e}'))
+                    continue
+                if options['verbosity'] > 1:
+                    self.stdout.write(output)
+                self.stdout.write(f'[{schema_name}] rebuilt in {seconds:.1f}s')
+
+        if failed:
+            raise CommandError(f"Rebuilding failed for: {', '.join(sorted(failed))}")
+        self.stdout.write(self.style.SUCCESS(f'Done: {len(schemas)} search indexes rebuilt.'))
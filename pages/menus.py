@@ -0,0 +1,84 @@
+"""
+Cached, prefetched menus for the get_menu template tag.
+
+A menu is loaded with all its items and their linked pages in one query, page
+URLs are resolved up front, and the result is kept as an immutable CachedMenu
+per tenant + site + slug. Keys embed the 'menus' and 'pages' generations, so a
+Menu/MenuItem save or any page publish, unpublish, move or slug change
+(see pages.signals) invalidates it.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.cache import LocalCache, get_generations, tenant_key
+
+from .page_cache import CONTENT_GENERATION, MENUS_GENERATION
+from .theme import get_theme_resolver
+
+MENU_CACHE_TIMEOUT = getattr(settings, 'MENU_CACHE_TIMEOUT', 60 * 60 * 24)
+
+MenuLink = namedtuple('MenuLink', ['title', 'link', 'open_in_new_tab'])
+CachedMenu = namedtuple('CachedMenu', ['title', 'slug', 'items'])
+
+# Cached in place of a menu that doesn't exist, as both caches read None as a miss
+MISSING = 'missing'
+
+_local_cache = LocalCache(maxsize=512, ttl=60)
+
+
+def load_menu(slug, request=None):
+    """Builds a CachedMenu from the database, or returns None if it doesn't exist."""
+    from .models import Menu, MenuItem
+
+    menu_items = list(
+        MenuItem.objects.filter(menu__slug=slug)
+        .select_related('menu', 'link_page')
+        .order_by('sort_order')
+    )
+    if menu_items:
+        menu = menu_items[0].menu
+    else:
+        menu = Menu.objects.filter(slug=slug).first()
+        if menu is None:
+            return None
+
+    return CachedMenu(
+        title=menu.title,
+        slug=menu.slug,
+        items=tuple(
+            MenuLink(item.title, item.get_link(request), item.open_in_new_tab)
+            for item in menu_items
+        ),
+    )
+
+
+def get_menu(slug, request=None):
+    """Returns the CachedMenu for `slug` on the request's site, or None if there's no such menu."""
+    menus = getattr(request, '_menus', None) if request is not None else None
+    if menus is not None and slug in menus:
+        return menus[slug]
+
+    site = get_theme_resolver(request).site
+    generations = get_generations(MENUS_GENERATION, CONTENT_GENERATION)
+    key = "menu:{}:{}:{}:{}".format(
+        getattr(site, 'pk', None), slug,
+        generations[MENUS_GENERATION], generations[CONTENT_GENERATION],
+    )
+
+    menu = _local_cache.get(tenant_key(key))
+    if menu is None:
+        menu = cache.get(key)
+        if menu is None:
+            menu = load_menu(slug, request) or MISSING
+            cache.set(key, menu, MENU_CACHE_TIMEOUT)
+        _local_cache.set(tenant_key(key), menu)
+    if menu == MISSING:
+        menu = None
+
+    if request is not None:
+        if menus is None:
+            menus = request._menus = {}
+        menus[slug] = menu
+    return menu
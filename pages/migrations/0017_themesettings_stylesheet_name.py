@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 06:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0016_alter_themesettings_base_theme'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='themesettings',
+            name='stylesheet_name',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+    ]
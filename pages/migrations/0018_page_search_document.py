@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 06:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0017_themesettings_stylesheet_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpostpage',
+            name='search_document',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='contentpage',
+            name='search_document',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='serviceareapage',
+            name='search_document',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='servicepage',
+            name='search_document',
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
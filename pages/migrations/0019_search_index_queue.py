@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 06:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('pages', '0018_page_search_document'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchIndexQueue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.CharField(max_length=255)),
+                ('queued_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['queued_at'], name='pages_searc_queued__402685_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchindexqueue',
+            constraint=models.UniqueConstraint(fields=('content_type', 'object_id'), name='unique_search_index_queue_object'),
+        ),
+    ]
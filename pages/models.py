@@ -10,9 +10,6 @@ from wagtail.contrib.settings.models import BaseSiteSetting, register_setting
 from wagtail.contrib.forms.models import AbstractEmailForm, AbstractFormField
 from wagtail.search import index
 
-from wagtail.images.blocks import ImageChooserBlock
-from wagtail.documents.blocks import DocumentChooserBlock
-
 from .blocks import (
     HeroBlock, AboutBlock, ServicesBlock, FAQBlock, 
     TestimonialsBlock, CTABlock, GalleryBlock, DocumentBlock,
@@ -20,6 +17,56 @@ from .blocks import (
     CarouselHeroBlock, WhyChooseUsBlock, IndustriesBlock,
     ProcessStepsBlock, TrustBarBlock, LeadFormBlock, FinalCTABlock
 )
+from .page_cache import PageCacheMixin
+from .prefetch import DocumentChooserBlock, ImageChooserBlock, PageStreamBlock
+from .theme import get_theme_resolver
+
+
+class ThemedPageMixin:
+    """Renders the page with `theme_template` from the site's active theme."""
+    theme_template = None
+
+    def get_template(self, request, *args, **kwargs):
+        return get_theme_resolver(request).page_template(self.theme_template)
+
+
+# Search field boosts. Page.search_fields boosts the title by 2; the Postgres
+# search backend maps the distinct boosts onto tsvector weights A-D, so a
+# title match outranks an intro match, which outranks a body match.
+SEARCH_INTRO_BOOST = 1.5
+SEARCH_BODY_BOOST = 1
+
+
+class SearchDocumentMixin(models.Model):
+    """
+    Keeps `search_document`, the plain text of the page's StreamFields as
+    extracted by each block's get_searchable_content, up to date on save.
+    It is indexed instead of the StreamFields themselves.
+    """
+    search_document_fields = ('body',)
+
+    search_document = models.TextField(blank=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def build_search_document(self):
+        content = []
+        for name in self.search_document_fields:
+            field = self._meta.get_field(name)
+            content.extend(field.stream_block.get_searchable_content(getattr(self, name)))
+        return '\n'.join(text for text in content if text)
+
+    def save(self, *args, **kwargs):
+        # save_revision() saves drafts with update_fields that leave the body
+        # out; the live row's document must keep describing the live body
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(update_fields) & set(self.search_document_fields):
+            self.search_document = self.build_search_document()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'search_document'}
+        return super().save(*args, **kwargs)
+
 
 # ==============================================
 # THEME CONFIGURATION
@@ -76,6 +123,9 @@ class ThemeSettings(BaseSiteSetting):
     )
     
     last_ai_prompt = models.TextField(blank=True, null=True)
+
+    # Compiled stylesheet in default_storage, see pages.stylesheets
+    stylesheet_name = models.CharField(max_length=100, blank=True, editable=False)
     
     panels = [
         MultiFieldPanel([
@@ -102,6 +152,13 @@ class ThemeSettings(BaseSiteSetting):
         ], heading="Typography"),
     ]
 
+    def save(self, *args, **kwargs):
+        from .stylesheets import compile_theme_stylesheet
+        self.stylesheet_name = compile_theme_stylesheet(self)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'stylesheet_name'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Theme Settings for {self.site}"
 
@@ -323,35 +380,30 @@ ALL_BLOCKS = [
     ('document', DocumentBlock()),
 ]
 
-class ContentPage(Page):
+class ContentPage(SearchDocumentMixin, PageCacheMixin, ThemedPageMixin, Page):
+    theme_template = "content_page.html"
+    sections_field = "body"
     page_description = "Standard page with modular sections (StreamField) for custom layouts."
-    body = StreamField(ALL_BLOCKS, use_json_field=True)
+    body = StreamField(PageStreamBlock(ALL_BLOCKS), use_json_field=True)
 
     content_panels = Page.content_panels + [
         FieldPanel('body'),
     ]
 
     search_fields = Page.search_fields + [
-        index.SearchField('body'),
+        index.SearchField('search_document', boost=SEARCH_BODY_BOOST),
     ]
 
     class Meta:
         verbose_name = "01. Content Page"
 
-    def get_template(self, request, *args, **kwargs):
-        site = getattr(request, 'site', None)
-        if not site:
-            from wagtail.models import Site
-            site = Site.objects.get(is_default_site=True)
-        config = ThemeSettings.for_site(site)
-        theme = config.base_theme if config else 'modern'
-        return f"themes/{theme}/pages/content_page.html"
-
 # ==============================================
 # SERVICE DETAIL PAGE
 # ==============================================
 
-class ServicePage(Page):
+class ServicePage(SearchDocumentMixin, PageCacheMixin, ThemedPageMixin, Page):
+    theme_template = "service_page.html"
+    sections_field = "body"
     page_description = "Detailed page for a specific security service (e.g., CCTV, Alarms)."
     icon = models.CharField(max_length=50, blank=True, help_text="FontAwesome class e.g. fa-shield-halved")
     featured_image = models.ForeignKey(
@@ -362,7 +414,7 @@ class ServicePage(Page):
     )
     intro = models.TextField(blank=True)
     
-    body = StreamField(ALL_BLOCKS, use_json_field=True)
+    body = StreamField(PageStreamBlock(ALL_BLOCKS), use_json_field=True)
 
     content_panels = Page.content_panels + [
         MultiFieldPanel([
@@ -374,19 +426,10 @@ class ServicePage(Page):
     ]
 
     search_fields = Page.search_fields + [
-        index.SearchField('intro'),
-        index.SearchField('body'),
+        index.SearchField('intro', boost=SEARCH_INTRO_BOOST),
+        index.SearchField('search_document', boost=SEARCH_BODY_BOOST),
     ]
 
-    def get_template(self, request, *args, **kwargs):
-        site = getattr(request, 'site', None)
-        if not site:
-            from wagtail.models import Site
-            site = Site.objects.get(is_default_site=True)
-        config = ThemeSettings.for_site(site)
-        theme = config.base_theme if config else 'modern'
-        return f"themes/{theme}/pages/service_page.html"
-
     class Meta:
         verbose_name = "02. Service Page"
 
@@ -399,9 +442,9 @@ class FormField(AbstractFormField):
 
 class ContactPage(AbstractEmailForm):
     page_description = "Page with a contact form, address, and emergency contact details."
-    intro = StreamField([
+    intro = StreamField(PageStreamBlock([
         ('hero', HeroBlock()),
-    ], use_json_field=True, blank=True)
+    ]), use_json_field=True, blank=True)
     thank_you_text = models.TextField(blank=True)
 
     address = models.TextField(blank=True, help_text="Physical address for the map section")
@@ -427,7 +470,7 @@ class ContactPage(AbstractEmailForm):
     ]
 
     search_fields = AbstractEmailForm.search_fields + [
-        index.SearchField('intro'),
+        index.SearchField('intro', boost=SEARCH_INTRO_BOOST),
     ]
 
     class Meta:
@@ -437,28 +480,24 @@ class ContactPage(AbstractEmailForm):
 # BLOG SYSTEM
 # ==============================================
 
-class BlogIndexPage(Page):
+class BlogIndexPage(PageCacheMixin, ThemedPageMixin, Page):
+    theme_template = "blog_index_page.html"
     intro = models.TextField(blank=True)
 
     content_panels = Page.content_panels + [
         FieldPanel('intro'),
     ]
 
+    search_fields = Page.search_fields + [
+        index.SearchField('intro', boost=SEARCH_INTRO_BOOST),
+    ]
+
     class Meta:
         verbose_name = "04. Articles Index"
 
     subpage_types = ['BlogPostPage']
     page_description = "Listing page that automatically gathers and displays article posts."
 
-    def get_template(self, request, *args, **kwargs):
-        site = getattr(request, 'site', None)
-        if not site:
-            from wagtail.models import Site
-            site = Site.objects.get(is_default_site=True)
-        config = ThemeSettings.for_site(site)
-        theme = config.base_theme if config else 'modern'
-        return f"themes/{theme}/pages/blog_index_page.html"
-
     def get_context(self, request):
         context = super().get_context(request)
         # Optimization: Fetch specific BlogPostPage objects to avoid N+1 queries
@@ -466,7 +505,8 @@ class BlogIndexPage(Page):
         context['blogposts'] = blogposts
         return context
 
-class BlogPostPage(Page):
+class BlogPostPage(SearchDocumentMixin, PageCacheMixin, ThemedPageMixin, Page):
+    theme_template = "blog_post_page.html"
     date = models.DateField("Post date")
     intro = models.CharField(max_length=250)
     featured_image = models.ForeignKey(
@@ -477,17 +517,19 @@ class BlogPostPage(Page):
     )
     category = models.CharField(max_length=100, blank=True, help_text="e.g. CCTV, Access Control, Tips")
     
-    body = StreamField([
+    body = StreamField(PageStreamBlock([
         ('heading', blocks.CharBlock(form_classname="title")),
         ('paragraph', blocks.RichTextBlock()),
         ('image', ImageChooserBlock()),
         ('cta', CTABlock()),
         ('lead_magnet', LeadMagnetBlock()),
-    ], use_json_field=True)
+    ]), use_json_field=True)
 
     search_fields = Page.search_fields + [
-        index.SearchField('intro'),
-        index.SearchField('body'),
+        index.SearchField('intro', boost=SEARCH_INTRO_BOOST),
+        index.SearchField('category', boost=SEARCH_INTRO_BOOST),
+        index.AutocompleteField('category'),
+        index.SearchField('search_document', boost=SEARCH_BODY_BOOST),
     ]
 
     content_panels = Page.content_panels + [
@@ -506,20 +548,12 @@ class BlogPostPage(Page):
     parent_page_types = ['BlogIndexPage']
     page_description = "Individual news article or informative security post."
 
-    def get_template(self, request, *args, **kwargs):
-        site = getattr(request, 'site', None)
-        if not site:
-            from wagtail.models import Site
-            site = Site.objects.get(is_default_site=True)
-        config = ThemeSettings.for_site(site)
-        theme = config.base_theme if config else 'modern'
-        return f"themes/{theme}/pages/blog_post_page.html"
-
 # ==============================================
 # SERVICE AREA SYSTEM
 # ==============================================
 
-class ServiceAreaIndexPage(Page):
+class ServiceAreaIndexPage(PageCacheMixin, ThemedPageMixin, Page):
+    theme_template = "service_area_index_page.html"
     intro = models.TextField(blank=True)
 
     def get_context(self, request):
@@ -539,39 +573,28 @@ class ServiceAreaIndexPage(Page):
     subpage_types = ['ServiceAreaPage']
     page_description = "Index page to list all geographical regions where services are provided."
 
-    def get_template(self, request, *args, **kwargs):
-        site = getattr(request, 'site', None)
-        if not site:
-            from wagtail.models import Site
-            site = Site.objects.get(is_default_site=True)
-        config = ThemeSettings.for_site(site)
-        theme = config.base_theme if config else 'modern'
-        return f"themes/{theme}/pages/service_area_index_page.html"
-
-class ServiceAreaPage(Page):
+class ServiceAreaPage(SearchDocumentMixin, PageCacheMixin, ThemedPageMixin, Page):
+    theme_template = "service_area_page.html"
+    sections_field = "body"
     location_name = models.CharField(max_length=100)
-    body = StreamField(ALL_BLOCKS, use_json_field=True)
+    body = StreamField(PageStreamBlock(ALL_BLOCKS), use_json_field=True)
 
     content_panels = Page.content_panels + [
         FieldPanel('location_name'),
         FieldPanel('body'),
     ]
 
+    search_fields = Page.search_fields + [
+        index.SearchField('location_name', boost=SEARCH_INTRO_BOOST),
+        index.SearchField('search_document', boost=SEARCH_BODY_BOOST),
+    ]
+
     class Meta:
         verbose_name = "↳ Area Detail Page"
 
     parent_page_types = ['ServiceAreaIndexPage']
     page_description = "Detailed page for a specific location or service region."
 
-    def get_template(self, request, *args, **kwargs):
-        site = getattr(request, 'site', None)
-        if not site:
-            from wagtail.models import Site
-            site = Site.objects.get(is_default_site=True)
-        config = ThemeSettings.for_site(site)
-        theme = config.base_theme if config else 'modern'
-        return f"themes/{theme}/pages/service_area_page.html"
-
 # ==============================================
 # DYNAMIC MENUS
 # ==============================================
@@ -602,14 +625,17 @@ class MenuItem(Orderable):
     )
     open_in_new_tab = models.BooleanField(default=False, blank=True)
 
-    @property
-    def link(self):
+    def get_link(self, request=None):
         if self.link_page:
-            return self.link_page.url
+            return self.link_page.get_url(request)
         elif self.link_url:
             return self.link_url
         return '#'
 
+    @property
+    def link(self):
+        return self.get_link()
+
     @property
     def title(self):
         if self.link_page and not self.link_title:
@@ -624,3 +650,25 @@ class MenuItem(Orderable):
         FieldPanel('link_page'),
         FieldPanel('open_in_new_tab'),
     ]
+
+
+class SearchIndexQueue(models.Model):
+    """
+    Objects whose search index entry is out of date (see pages.search_index).
+    There's one row per object however often it changes before the worker
+    gets to it; `queued_at` is when the oldest of those changes was made.
+    """
+    content_type = models.ForeignKey('contenttypes.ContentType', on_delete=models.CASCADE, related_name='+')
+    object_id = models.CharField(max_length=255)
+    queued_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'object_id'], name='unique_search_index_queue_object'),
+        ]
+        indexes = [models.Index(fields=['queued_at'])]
+
+    def __str__(self):
+        return f"{self.content_type_id}:{self.object_id}"
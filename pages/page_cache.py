@@ -0,0 +1,183 @@
+"""
+Full-page HTML cache for anonymous visitors.
+
+Rendered responses are stored in the shared cache under the tenant schema
+(added by the cache KEY_FUNCTION), site, path, theme template version and the
+current 'pages', 'settings' and 'menus' generations. pages.signals bumps those
+generations on page publish/unpublish/move/delete and on ThemeSettings,
+SiteSettings and Menu saves, which orphans every cached page of the tenant
+at once.
+
+The same state yields the ETag and Last-Modified validators, so a revalidating
+browser or crawler gets a 304 without the page being rendered at all.
+
+Pages that stream (see pages.streaming) are cached once the last chunk has
+been sent. Cached pages are stored minified (pages that aren't cached are
+sent as rendered), with Brotli and gzip variants
+served by Accept-Encoding (see pages.compression).
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from core.cache import get_generations, get_last_changed
+
+from .compression import HTML_MINIFY_ENABLED, apply_encoding, compress_variants, minify_html
+from .streaming import can_stream, stream_page
+from .theme import get_theme_resolver
+from .theme_manifest import manifest
+
+PAGE_CACHE_ENABLED = getattr(settings, 'PAGE_CACHE_ENABLED', False)
+PAGE_CACHE_TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 15)
+
+CONTENT_GENERATION = 'pages'
+SETTINGS_GENERATION = 'settings'
+MENUS_GENERATION = 'menus'
+PAGE_GENERATIONS = (CONTENT_GENERATION, SETTINGS_GENERATION, MENUS_GENERATION)
+
+
+def is_anonymous_get(request):
+    user = getattr(request, 'user', None)
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.GET
+        and not getattr(request, 'is_preview', False)
+        and not (user is not None and user.is_authenticated)
+    )
+
+
+def is_cacheable_response(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not response.has_header('Cache-Control')
+        # A CSRF token in the body is tied to this visitor's cookie
+        and not request.META.get('CSRF_COOKIE_USED')
+    )
+
+
+def page_cache_key(request, generations=None):
+    if generations is None:
+        generations = get_generations(*PAGE_GENERATIONS)
+    site_id = getattr(get_theme_resolver(request).site, 'pk', None)
+    path = hashlib.md5(request.path.encode('utf-8')).hexdigest()
+    return "pagecache:{}:{}:{}:{}:{}:{}".format(
+        site_id, generations[CONTENT_GENERATION], generations[SETTINGS_GENERATION],
+        generations[MENUS_GENERATION], manifest.version, path,
+    )
+
+
+def page_validators(page, request, generations):
+    """
+    Returns the (etag, last_modified) pair for an anonymous view of `page`.
+
+    The ETag covers everything the page cache key does, so it changes whenever
+    the page, any other page, the settings, menus or theme templates do.
+    Last-Modified is the latest of the page's own publish time and the last
+    bump of those generations, or None when that isn't known.
+    """
+    key = "{}:{}".format(page.pk, page_cache_key(request, generations))
+    etag = quote_etag(hashlib.md5(key.encode('utf-8')).hexdigest())
+
+    last_changed = get_last_changed(*PAGE_GENERATIONS)
+    if last_changed is None:
+        return etag, None
+    if page.last_published_at is not None:
+        last_changed = max(last_changed, page.last_published_at.timestamp())
+    return etag, int(last_changed)
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    if not response.has_header('Cache-Control'):
+        # Let browsers store the page but revalidate it on every use
+        response['Cache-Control'] = 'no-cache'
+
+
+def is_cacheable_stream(request, response):
+    # Same conditions as is_cacheable_response, checked after the last chunk
+    return (
+        response.status_code == 200
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_USED')
+    )
+
+
+def _response_from_cache(entry):
+    response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['X-Page-Cache'] = 'HIT'
+    return response
+
+
+def _cache_entry(content, content_type):
+    return {
+        'content': content,
+        'content_type': content_type,
+        'variants': compress_variants(content),
+    }
+
+
+def minify_response(response):
+    if HTML_MINIFY_ENABLED and response['Content-Type'].startswith('text/html'):
+        response.content = minify_html(response.content.decode(response.charset)).encode(response.charset)
+
+
+class PageCacheMixin:
+    """
+    Answers conditional anonymous GETs of a Wagtail page with 304 Not Modified
+    before anything is rendered, and serves the rest from the full-page cache.
+    """
+
+    def serve(self, request, *args, **kwargs):
+        if not is_anonymous_get(request):
+            return super().serve(request, *args, **kwargs)
+
+        generations = get_generations(*PAGE_GENERATIONS)
+        etag, last_modified = page_validators(self, request, generations)
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            if not_modified.status_code == 304:
+                set_validators(not_modified, etag, last_modified)
+            return not_modified
+
+        key = page_cache_key(request, generations) if PAGE_CACHE_ENABLED else None
+        entry = cache.get(key) if key else None
+        if entry is not None:
+            response = _response_from_cache(entry)
+            set_validators(response, etag, last_modified)
+            return apply_encoding(response, request, entry.get('variants', {}))
+
+        if can_stream(self, request):
+            return self.serve_streaming(request, key, etag, last_modified, *args, **kwargs)
+
+        response = super().serve(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        if is_cacheable_response(request, response):
+            set_validators(response, etag, last_modified)
+            if key:
+                # Minifying pays off once the page is served from the cache
+                minify_response(response)
+                entry = _cache_entry(response.content, response['Content-Type'])
+                cache.set(key, entry, PAGE_CACHE_TIMEOUT)
+                response['X-Page-Cache'] = 'MISS'
+                apply_encoding(response, request, entry['variants'])
+        return response
+
+    def serve_streaming(self, request, key, etag, last_modified, *args, **kwargs):
+        def on_complete(response, content):
+            if key and is_cacheable_stream(request, response):
+                cache.set(key, _cache_entry(content, response['Content-Type']), PAGE_CACHE_TIMEOUT)
+
+        response = stream_page(self, request, *args, on_complete=on_complete, minify=bool(key), **kwargs)
+        if key:
+            response['X-Page-Cache'] = 'MISS'
+        set_validators(response, etag, last_modified)
+        return response
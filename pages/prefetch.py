@@ -0,0 +1,142 @@
+"""
+Page-level prefetching of images and documents referenced from StreamField
+bodies.
+
+Wagtail converts a lazy StreamValue one block type at a time, so a body with
+hero, services, industries, testimonials, partners and gallery sections
+fetches images once per block type, and then looks up renditions once per
+image. PageStreamBlock returns a StreamValue that, on first access, walks the
+raw JSON of the whole stream, collects the id of every chooser value (however
+deeply nested in ListBlocks and StructBlocks) and loads each model in one
+query, images together with all their renditions. The chooser blocks below
+resolve ids from that identity map instead of querying, whether the stream is
+rendered or only read (as ai.api and ai.services do).
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from copy import copy
+
+from wagtail import blocks
+from wagtail.blocks.stream_block import StreamValue
+from wagtail.documents import blocks as document_blocks
+from wagtail.images import blocks as image_blocks
+from wagtail.images import get_image_model
+
+# model -> {pk: instance} while a PrefetchingStreamValue is converting blocks
+_identity_map = ContextVar('stream_identity_map', default=None)
+
+
+@contextmanager
+def identity_map(objects):
+    token = _identity_map.set(objects)
+    try:
+        yield
+    finally:
+        _identity_map.reset(token)
+
+
+def _is_list_item(value):
+    # The {'type': 'item', 'value': ..., 'id': ...} format ListBlock stores since Wagtail 2.16
+    return isinstance(value, dict) and value.get('type') == 'item' and 'value' in value and 'id' in value
+
+
+def collect_chooser_ids(block, value, found):
+    """Adds the ids of every prefetchable chooser value within a raw block value to `found`."""
+    if value is None:
+        return
+    if isinstance(block, PrefetchedChooserMixin):
+        found[block.model_class].add(value)
+    elif isinstance(block, blocks.StructBlock):
+        if isinstance(value, dict):
+            for name, child_block in block.child_blocks.items():
+                collect_chooser_ids(child_block, value.get(name), found)
+    elif isinstance(block, blocks.ListBlock):
+        for item in value:
+            collect_chooser_ids(block.child_block, item['value'] if _is_list_item(item) else item, found)
+    elif isinstance(block, blocks.StreamBlock):
+        for child in value:
+            child_block = block.child_blocks.get(child.get('type'))
+            if child_block is not None:
+                collect_chooser_ids(child_block, child.get('value'), found)
+
+
+def load_objects(found):
+    """
+    Loads the collected ids, images with their renditions prefetched. Ids
+    that no longer exist map to None so they aren't looked up again.
+    """
+    objects = {}
+    for model, ids in found.items():
+        queryset = model.objects.filter(pk__in=ids)
+        if issubclass(model, get_image_model()):
+            queryset = queryset.prefetch_renditions()
+        objects[model] = dict.fromkeys(ids)
+        objects[model].update((obj.pk, obj) for obj in queryset)
+    return objects
+
+
+class PrefetchingStreamValue(StreamValue):
+    _prefetched_objects = None
+
+    def _prefetch_blocks(self, type_name):
+        if self._prefetched_objects is None:
+            found = defaultdict(set)
+            collect_chooser_ids(self.stream_block, self._raw_data, found)
+            self._prefetched_objects = load_objects(found)
+        with identity_map(self._prefetched_objects):
+            super()._prefetch_blocks(type_name)
+
+
+class PageStreamBlock(blocks.StreamBlock):
+    """StreamBlock whose values prefetch every referenced image and document on first access."""
+
+    def to_python(self, value):
+        stream_value = super().to_python(value)
+        if stream_value.is_lazy and type(stream_value) is StreamValue:
+            return PrefetchingStreamValue(self, stream_value._raw_data, is_lazy=True)
+        return stream_value
+
+
+class PrefetchedChooserMixin:
+    """Resolves chooser values from the enclosing stream's identity map when present."""
+
+    def _get_prefetched(self):
+        objects = _identity_map.get()
+        return objects.get(self.model_class) if objects is not None else None
+
+    def to_python(self, value):
+        prefetched = self._get_prefetched()
+        if prefetched is not None and value in prefetched:
+            return prefetched[value]
+        return super().to_python(value)
+
+    def bulk_to_python(self, values):
+        values = list(values)
+        prefetched = self._get_prefetched()
+        if prefetched is None or any(v is not None and v not in prefetched for v in values):
+            return super().bulk_to_python(values)
+
+        seen = set()
+        result = []
+        for value in values:
+            obj = prefetched.get(value)
+            if obj is not None and value in seen:
+                # Like ChooserBlock.bulk_to_python: repeated ids get their own instance
+                obj = copy(obj)
+            result.append(obj)
+            seen.add(value)
+        return result
+
+
+class ImageChooserBlock(PrefetchedChooserMixin, image_blocks.ImageChooserBlock):
+    def deconstruct(self):
+        # Same definition as Wagtail's block, so migrations are unaffected
+        _path, args, kwargs = super().deconstruct()
+        return 'wagtail.images.blocks.ImageChooserBlock', args, kwargs
+
+
+class DocumentChooserBlock(PrefetchedChooserMixin, document_blocks.DocumentChooserBlock):
+    def deconstruct(self):
+        _path, args, kwargs = super().deconstruct()
+        return 'wagtail.documents.blocks.DocumentChooserBlock', args, kwargs
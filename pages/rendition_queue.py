@@ -0,0 +1,195 @@
+"""
+Background rendition generation.
+
+Image renditions used to be generated by the first visitor who needed them.
+Instead, page publishes and ThemeSettings/SiteSettings/Image saves (see
+pages.signals) queue the images they reference, once the transaction commits,
+onto a few threads of the web process that generate the renditions
+pages.renditions will ask for. Work items are (schema, image id, role, theme);
+generating an existing rendition is a no-op, so items can be repeated or
+retried freely.
+
+Threads don't add processes to each web worker, and the interpreter waits
+for them to finish queued work on a clean shutdown. Items still queued when
+a worker is killed are lost, and their renditions are generated on first
+request as before. The `pregenerate_renditions` command backfills whole
+tenants with its own pool of processes (see make_executor()), which run
+outside the web workers; model imports stay inside functions for them.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from .renditions import get_role_filters
+from .settings_cache import get_theme_settings
+
+logger = logging.getLogger(__name__)
+
+# Threads per web process; 0 leaves renditions to be generated on first request
+RENDITION_WORKERS = getattr(settings, 'RENDITION_WORKERS', 2)
+
+_lock = threading.Lock()
+_executor = None
+_pending = set()
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def make_executor(max_workers=None):
+    """A pool of spawned processes, for commands that generate renditions in bulk."""
+    return ProcessPoolExecutor(
+        max_workers=max_workers or RENDITION_WORKERS,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+    )
+
+
+def generate_renditions(schema_name, image_id, role, theme=None):
+    """Generates the renditions of one image for a role. Returns how many were needed."""
+    from django_tenants.utils import schema_context
+    from wagtail.images import get_image_model
+
+    with schema_context(schema_name):
+        image = get_image_model().objects.filter(pk=image_id).first()
+        if image is None:
+            return 0
+        filters = get_role_filters(image, role, theme)
+        image.get_renditions(*filters)
+        return len(filters)
+
+
+def _generate(item):
+    try:
+        return generate_renditions(*item)
+    finally:
+        # Each thread has its own connection; drop it once it's past CONN_MAX_AGE
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=RENDITION_WORKERS, thread_name_prefix='renditions')
+    return _executor
+
+
+def _done(item, future):
+    with _lock:
+        _pending.discard(item)
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Generating renditions for %s failed", item, exc_info=future.exception())
+
+
+def submit(item):
+    """Submits a work item unless the same one is already queued."""
+    with _lock:
+        if item in _pending:
+            return None
+        _pending.add(item)
+        future = _get_executor().submit(_generate, item)
+    future.add_done_callback(lambda f: _done(item, f))
+    return future
+
+
+def enqueue_renditions(items):
+    """
+    Queues (image_id, role, theme) triples of the current tenant once the
+    current transaction commits.
+    """
+    if not RENDITION_WORKERS:
+        return
+    schema_name = connection.schema_name
+    work = {(schema_name, image_id, role, theme) for image_id, role, theme in items if image_id}
+    if work:
+        transaction.on_commit(lambda: [submit(item) for item in work])
+
+
+def collect_role_images(block, value, found, role=None):
+    """
+    Adds (image_id, role) pairs for every ImageChooserBlock within a raw block
+    value to `found`. An image's role is the `rendition_role` in the Meta of
+    the nearest block around it; images outside any such block aren't
+    rendered with responsive_image, so they're skipped.
+    """
+    from wagtail import blocks
+    from wagtail.images.blocks import ImageChooserBlock
+
+    from .prefetch import _is_list_item
+
+    if value is None:
+        return
+    role = getattr(block.meta, 'rendition_role', role)
+    if isinstance(block, ImageChooserBlock):
+        if role:
+            found.add((value, role))
+    elif isinstance(block, blocks.StructBlock):
+        if isinstance(value, dict):
+            for name, child_block in block.child_blocks.items():
+                collect_role_images(child_block, value.get(name), found, role)
+    elif isinstance(block, blocks.ListBlock):
+        for item in value:
+            collect_role_images(block.child_block, item['value'] if _is_list_item(item) else item, found, role)
+    elif isinstance(block, blocks.StreamBlock):
+        for child in value:
+            child_block = block.child_blocks.get(child.get('type'))
+            if child_block is not None:
+                collect_role_images(child_block, child.get('value'), found, role)
+
+
+def get_page_rendition_items(page, theme=None):
+    """
+    (image_id, role, theme) triples for the images in a page's StreamFields,
+    read from the raw stream data so nothing is deserialized.
+    """
+    from wagtail.fields import StreamField
+
+    found = set()
+    for field in page._meta.get_fields():
+        if isinstance(field, StreamField):
+            collect_role_images(field.stream_block, getattr(page, field.name).raw_data, found)
+    return {(image_id, role, theme) for image_id, role in found}
+
+
+def get_settings_rendition_items(theme_settings=None, site_settings=None):
+    """(image_id, role, theme) triples for the logo and hero images in site settings."""
+    theme = getattr(theme_settings, 'base_theme', None)
+    items = set()
+    if theme_settings is not None:
+        items.add((theme_settings.logo_id, 'logo', theme))
+        items.add((theme_settings.hero_bg_image_id, 'hero', theme))
+    if site_settings is not None:
+        items.add((site_settings.logo_id, 'logo', theme))
+    return {item for item in items if item[0]}
+
+
+def get_page_theme(page):
+    site = page.get_site()
+    return get_theme_settings(site).base_theme if site else None
+
+
+def get_image_rendition_items(image):
+    """
+    (image_id, role, theme) triples for everywhere `image` is used, found
+    through Wagtail's reference index.
+    """
+    from wagtail.models import Page, ReferenceIndex
+
+    from .models import SiteSettings, ThemeSettings
+
+    items = set()
+    for source, _references in ReferenceIndex.get_references_to(image).group_by_source_object():
+        if isinstance(source, Page):
+            page = source.specific
+            items |= get_page_rendition_items(page, get_page_theme(page))
+        elif isinstance(source, ThemeSettings):
+            items |= get_settings_rendition_items(theme_settings=source)
+        elif isinstance(source, SiteSettings):
+            items |= get_settings_rendition_items(site_settings=source)
+    return {item for item in items if item[0] == image.pk}
@@ -0,0 +1,105 @@
+"""
+Rendition specs and responsive <img> markup for theme templates.
+
+Templates ask for an image by role ("hero", "about", "logo") instead of a
+Wagtail filter. Each role maps to a fixed set of width-bounded renditions
+(or fixed-height 1x/2x renditions for logos) plus the `sizes` hint matching
+its layout, and themes can override the specs of the roles they lay out
+differently. Keeping the set fixed means every site generates and caches
+the same handful of renditions per image.
+"""
+from collections import namedtuple
+
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+RenditionSpec = namedtuple('RenditionSpec', ['widths', 'sizes', 'height', 'loading'])
+RenditionSpec.__new__.__defaults__ = ((), '100vw', None, 'lazy')
+
+# Widths up to the 1320px Bootstrap container at 2x, in steps that keep
+# the over-download for any viewport under ~50%
+RENDITION_SPECS = {
+    'hero': RenditionSpec(widths=(640, 960, 1280, 1920, 2560), sizes='100vw', loading='eager'),
+    'about': RenditionSpec(widths=(480, 720, 960, 1320), sizes='(min-width: 992px) 50vw, 100vw'),
+    'logo': RenditionSpec(height=40, loading='eager'),
+}
+
+THEME_RENDITION_SPECS = {
+    'creative': {
+        'hero': RenditionSpec(widths=(480, 720, 960), sizes='(min-width: 992px) 33vw, 100vw', loading='eager'),
+    },
+    'editorial': {
+        'hero': RenditionSpec(widths=(640, 960, 1320, 1920, 2640),
+                              sizes='(min-width: 1400px) 1296px, 100vw', loading='eager'),
+        'about': RenditionSpec(widths=(480, 720, 960, 1320), sizes='(min-width: 992px) 42vw, 100vw'),
+    },
+    'saas': {
+        'hero': RenditionSpec(widths=(640, 960, 1320, 1920, 2640),
+                              sizes='(min-width: 1400px) 1296px, 100vw', loading='eager'),
+    },
+}
+
+
+def get_rendition_spec(role, theme=None):
+    spec = THEME_RENDITION_SPECS.get(theme, {}).get(role) or RENDITION_SPECS.get(role)
+    if spec is None:
+        raise KeyError(f"Unknown rendition role '{role}'")
+    return spec
+
+
+def get_rendition_filters(image, spec):
+    """
+    Wagtail filter specs for an image; widths the original can't fill are
+    dropped rather than upscaled.
+    """
+    if spec.height:
+        return [f"height-{spec.height}", f"height-{spec.height * 2}"]
+    widths = [w for w in spec.widths if w <= (image.width or 0)] or [min(spec.widths)]
+    return [f"width-{w}" for w in widths]
+
+
+def get_role_filters(image, role, theme=None):
+    """
+    Filter specs responsive_image needs for `image` in `role`, for one theme
+    or, when `theme` is None, for every theme.
+    """
+    themes = [theme] if theme else [None, *THEME_RENDITION_SPECS]
+    filters = []
+    for name in themes:
+        for filter_spec in get_rendition_filters(image, get_rendition_spec(role, name)):
+            if filter_spec not in filters:
+                filters.append(filter_spec)
+    return filters
+
+
+def responsive_image_html(image, role, theme=None, **attrs):
+    """Renders an <img> with srcset, sizes, intrinsic dimensions and lazy loading."""
+    spec = get_rendition_spec(role, theme)
+    filters = get_rendition_filters(image, spec)
+    renditions = image.get_renditions(*filters)
+    sources = [renditions[f] for f in filters]
+
+    if spec.height:
+        # Fixed-height images (logos) pick by pixel density
+        src = sources[0]
+        srcset = f"{sources[0].url} 1x, {sources[1].url} 2x"
+        sizes = None
+    else:
+        src = sources[-1]
+        srcset = ", ".join(f"{r.url} {r.width}w" for r in sources)
+        sizes = spec.sizes
+
+    img_attrs = {
+        'src': src.url,
+        'srcset': srcset,
+        'sizes': sizes,
+        'width': src.width,
+        'height': src.height,
+        'alt': getattr(image, 'default_alt_text', None) or image.title,
+        'loading': spec.loading,
+        'decoding': 'async',
+    }
+    if spec.loading == 'eager':
+        img_attrs['fetchpriority'] = 'high' if role == 'hero' else None
+    img_attrs.update(attrs)
+    return format_html('<img{}>', flatatt({k: v for k, v in img_attrs.items() if v is not None}))
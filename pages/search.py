@@ -0,0 +1,229 @@
+"""
+Cached site search and autocomplete.
+
+Search results are paged by keyset rather than OFFSET: results are ordered
+by (rank, id), both descending, and a page is the PER_PAGE + 1 results
+after (or before) the rank and id of a neighbouring page's last (or first)
+result, the extra row telling whether there's another page. Deep pages then
+cost the same as the first one. The total is counted once per query, and
+only up to SEARCH_COUNT_LIMIT.
+
+Pages of results are cached per tenant (via the cache KEY_FUNCTION), site,
+normalised query and cursor, together with the query's search promotions on
+the first page, as plain SearchHit tuples so a hit needs no database access
+at all. Autocomplete suggestions are cached the same way per prefix, with an
+in-process first level in front. Keys embed the 'pages' generation, bumped
+on every publish, unpublish, move and delete, and a 'search' generation
+bumped when search promotions change (see pages.signals).
+"""
+import hashlib
+import math
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from wagtail.models import Page
+from wagtail.search.utils import normalise_query_string
+
+from core.cache import LocalCache, get_generations, tenant_key
+
+from .page_cache import CONTENT_GENERATION
+
+SEARCH_GENERATION = 'search'
+
+SEARCH_CACHE_TIMEOUT = getattr(settings, 'SEARCH_CACHE_TIMEOUT', 60 * 60)
+SEARCH_RESULTS_PER_PAGE = 10
+# Totals above this are shown as "1000+"
+SEARCH_COUNT_LIMIT = 1000
+AUTOCOMPLETE_LIMIT = 8
+AUTOCOMPLETE_MIN_LENGTH = 2
+
+SearchHit = namedtuple('SearchHit', ['id', 'title', 'url', 'description'])
+Cursor = namedtuple('Cursor', ['score', 'id'])
+
+_autocomplete_cache = LocalCache(maxsize=2048, ttl=60)
+
+
+def normalise_query(query):
+    return normalise_query_string(query or '')
+
+
+def _cache_key(prefix, site, query, *parts):
+    generations = get_generations(CONTENT_GENERATION, SEARCH_GENERATION)
+    digest = hashlib.md5(query.encode('utf-8')).hexdigest()
+    return ':'.join(str(part) for part in (
+        prefix, site.pk, generations[CONTENT_GENERATION], generations[SEARCH_GENERATION], digest, *parts,
+    ))
+
+
+def _hit(page, request, description=None):
+    return SearchHit(page.pk, page.title, page.get_url(request), description or page.search_description)
+
+
+def load_promotions(query, request):
+    """The editor's picks for a normalised query, as SearchHits."""
+    from wagtail.contrib.search_promotions.models import Query
+
+    # Query.get() would create the row; searching shouldn't write
+    query_row = Query.objects.filter(query_string=query).first()
+    if query_row is None:
+        return []
+    hits = []
+    for promotion in query_row.editors_picks.select_related('page').order_by('sort_order'):
+        if promotion.page is not None:
+            if promotion.page.live:
+                hits.append(_hit(promotion.page, request, promotion.description))
+        elif promotion.external_link_url:
+            hits.append(SearchHit(None, promotion.external_link_text or promotion.external_link_url,
+                                  promotion.external_link_url, promotion.description))
+    return hits
+
+
+class SearchResultsPage:
+    """
+    A page of SearchHits with the cursors of its neighbours. `count` stops
+    at SEARCH_COUNT_LIMIT + 1; `count_is_capped` tells when it did.
+    """
+
+    def __init__(self, hits, count, next_cursor=None, previous_cursor=None):
+        self.object_list = hits
+        self.count = min(count, SEARCH_COUNT_LIMIT)
+        self.count_is_capped = count > SEARCH_COUNT_LIMIT
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def encode_cursor(result):
+    return f"{result.pk}:{result._score!r}"
+
+
+def decode_cursor(value):
+    """A Cursor from a query string value, or None if it isn't one."""
+    pk, _, score = (value or '').partition(':')
+    try:
+        cursor = Cursor(float(score), int(pk))
+    except ValueError:
+        return None
+    return cursor if math.isfinite(cursor.score) else None
+
+
+def ranked_queryset(query, site):
+    """
+    The site's live pages matching `query` as a queryset ordered by rank
+    and id, both descending, with the rank annotated as `_score`.
+    """
+    results = Page.objects.live().in_site(site).search(query).annotate_score('_score')
+    # The Postgres backend's results only become a queryset when evaluated;
+    # taking it as one lets it be filtered on the rank
+    return results.get_queryset()
+
+
+def count_results(queryset):
+    return queryset.order_by().values('pk')[:SEARCH_COUNT_LIMIT + 1].count()
+
+
+def load_results(query, site, after, before, request):
+    queryset = ranked_queryset(query, site)
+    if after is not None:
+        queryset = queryset.filter(Q(_score__lt=after.score) | Q(_score=after.score, pk__lt=after.id))
+    elif before is not None:
+        queryset = queryset.filter(
+            Q(_score__gt=before.score) | Q(_score=before.score, pk__gt=before.id)
+        ).order_by('_score', 'pk')
+
+    results = list(queryset[:SEARCH_RESULTS_PER_PAGE + 1])
+    has_more = len(results) > SEARCH_RESULTS_PER_PAGE
+    results = results[:SEARCH_RESULTS_PER_PAGE]
+    if before is not None:
+        results.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, after is not None
+
+    return {
+        'results': [_hit(result, request) for result in results],
+        'next_cursor': encode_cursor(results[-1]) if has_next and results else None,
+        'previous_cursor': encode_cursor(results[0]) if has_previous and results else None,
+        'promotions': load_promotions(query, request) if after is None and before is None else [],
+    }
+
+
+def get_results(query, site, after, before, request):
+    if after is not None:
+        position = ('after', *after)
+    elif before is not None:
+        position = ('before', *before)
+    else:
+        position = ('first',)
+    key = _cache_key('search', site, query, *position)
+    entry = cache.get(key)
+    if entry is None:
+        entry = load_results(query, site, after, before, request)
+        cache.set(key, entry, SEARCH_CACHE_TIMEOUT)
+    return entry
+
+
+def search_site(query, site, after=None, before=None, request=None):
+    """
+    Returns (SearchResultsPage, promotions) for a query on a site. `after`
+    and `before` are the `next_cursor` and `previous_cursor` of another
+    page; without either the first page is returned.
+    """
+    query = normalise_query(query)
+    if not query or site is None:
+        return SearchResultsPage([], 0), []
+    after, before = decode_cursor(after), decode_cursor(before)
+    if after is not None:
+        before = None
+
+    entry = get_results(query, site, after, before, request)
+    if before is not None and entry['previous_cursor'] is None:
+        # Paged back to the start: serve the first page itself, so it's
+        # complete and has its promotions
+        entry = get_results(query, site, None, None, request)
+
+    # Counted once per query rather than per page
+    count_key = _cache_key('search-count', site, query)
+    count = cache.get(count_key)
+    if count is None:
+        count = count_results(ranked_queryset(query, site))
+        cache.set(count_key, count, SEARCH_CACHE_TIMEOUT)
+
+    page = SearchResultsPage(entry['results'], count, entry['next_cursor'], entry['previous_cursor'])
+    return page, entry['promotions']
+
+
+def autocomplete(query, site, request=None):
+    """Up to AUTOCOMPLETE_LIMIT {'title', 'url'} suggestions for a title prefix."""
+    query = normalise_query(query)
+    if len(query) < AUTOCOMPLETE_MIN_LENGTH or site is None:
+        return []
+
+    key = _cache_key('autocomplete', site, query)
+    local_key = tenant_key(key)
+    suggestions = _autocomplete_cache.get(local_key)
+    if suggestions is not None:
+        return suggestions
+
+    suggestions = cache.get(key)
+    if suggestions is None:
+        pages = Page.objects.live().in_site(site).autocomplete(query)[:AUTOCOMPLETE_LIMIT]
+        suggestions = [{'title': page.title, 'url': page.get_url(request)} for page in pages]
+        cache.set(key, suggestions, SEARCH_CACHE_TIMEOUT)
+    _autocomplete_cache.set(local_key, suggestions)
+    return suggestions
@@ -0,0 +1,350 @@
+"""
+Per-tenant search indexes.
+
+Search uses Wagtail's database backend, which on Postgres stores a weighted
+tsvector per indexed object in `wagtailsearch_indexentry` with GIN indexes
+over it. wagtail.search is a tenant app as well as a shared one, so every
+schema has its own index table. Each holds only the objects whose tables
+live in that schema: a tenant's index has its own pages (the pages app's
+tables are per tenant), and models that only have shared tables, such as
+images, documents and plain wagtailcore Pages, are indexed once in the
+public schema. A tenant's searches therefore never scan another tenant's
+pages. The `rebuild_search_index` command rebuilds schemas in parallel
+processes, first refreshing the pages' denormalised search documents.
+
+With SEARCH_INDEX_QUEUE, saving or deleting an indexed object no longer
+updates the index inside the request (the backend's AUTO_UPDATE is off).
+Instead the object is queued in the tenant's SearchIndexQueue once the
+transaction commits, one row per object however often it's saved, and the
+`process_search_index_queue` worker indexes queued objects in batches, one
+bulk insert per model. `flush_search_index_queue` drains the queue at once,
+e.g. after seeding a site, and reports each tenant's lag: how long the
+oldest queued change has been waiting.
+"""
+import logging
+import multiprocessing
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+SEARCH_INDEX_QUEUE = getattr(settings, 'SEARCH_INDEX_QUEUE', True)
+SEARCH_INDEX_BATCH_SIZE = getattr(settings, 'SEARCH_INDEX_BATCH_SIZE', 200)
+# Objects that failed to index this many times wait for a rebuild
+SEARCH_INDEX_MAX_ATTEMPTS = 5
+
+_local = threading.local()
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def make_executor(max_workers):
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+    )
+
+
+def refresh_search_documents(batch_size=200):
+    """Rebuilds `search_document` for every page that has one. Returns how many changed."""
+    from django.apps import apps
+
+    from .models import SearchDocumentMixin
+
+    changed = 0
+    for model in apps.get_app_config('pages').get_models():
+        if not issubclass(model, SearchDocumentMixin):
+            continue
+        stale = []
+        for page in model.objects.iterator(chunk_size=batch_size):
+            document = page.build_search_document()
+            if document != page.search_document:
+                page.search_document = document
+                stale.append(page)
+        model.objects.bulk_update(stale, ['search_document'], batch_size=batch_size)
+        changed += len(stale)
+    return changed
+
+
+@lru_cache(maxsize=None)
+def get_tenant_app_labels():
+    from django.apps import apps
+
+    return frozenset(config.label for config in apps.get_app_configs() if config.name in settings.TENANT_APPS)
+
+
+def is_tenant_model(model):
+    """Whether `model` has a table in every tenant schema, rather than only a shared one."""
+    return model._meta.app_label in get_tenant_app_labels()
+
+
+def get_schema_indexed_models(schema_name):
+    """The indexed models whose objects belong in `schema_name`'s index."""
+    from django_tenants.utils import get_public_schema_name
+    from wagtail.search.index import get_indexed_models
+
+    if schema_name == get_public_schema_name():
+        return get_indexed_models()
+    return [model for model in get_indexed_models() if is_tenant_model(model)]
+
+
+def get_index_schema(model):
+    """The schema whose index holds objects of `model` saved in the current one."""
+    from django_tenants.utils import get_public_schema_name
+
+    return connection.schema_name if is_tenant_model(model) else get_public_schema_name()
+
+
+def group_models_by_index(backend, models):
+    """{index key: (index, models)} of the backend's indexes, in the order the models come."""
+    by_index = {}
+    for model in models:
+        index = backend.get_index_for_model(model)
+        if index is None:
+            continue
+        # Indexes of older Wagtail releases have no get_key(), only a name
+        key = index.get_key() if hasattr(index, 'get_key') else index.name
+        by_index.setdefault(key, (index, []))[1].append(model)
+    return by_index
+
+
+def rebuild_schema_index(chunk_size=None):
+    """
+    Rebuilds the current schema's index from the models that belong in it,
+    dropping entries of any other model. Returns {model label: objects indexed}.
+    """
+    from django.contrib.contenttypes.models import ContentType
+    from wagtail.search.backends import get_search_backends
+    from wagtail.search.models import IndexEntry
+
+    chunk_size = chunk_size or 1000
+    models = get_schema_indexed_models(connection.schema_name)
+    content_types = ContentType.objects.get_for_models(*models, for_concrete_models=False)
+    IndexEntry.objects.exclude(content_type__in=content_types.values()).delete()
+
+    counts = {}
+    for backend in get_search_backends():
+        if not backend.rebuilder_class:
+            continue
+        for index, index_models in group_models_by_index(backend, models).values():
+            rebuilder = backend.rebuilder_class(index)
+            index = rebuilder.start()
+            for model in index_models:
+                index.add_model(model)
+                queryset = model.get_indexed_objects().order_by('pk')
+                last_pk = None
+                counts.setdefault(model._meta.label, 0)
+                while True:
+                    chunk = list((queryset if last_pk is None else queryset.filter(pk__gt=last_pk))[:chunk_size])
+                    if not chunk:
+                        break
+                    index.add_items(model, chunk)
+                    counts[model._meta.label] += len(chunk)
+                    last_pk = chunk[-1].pk
+            rebuilder.finish()
+    return counts
+
+
+def rebuild_tenant_index(schema_name, chunk_size=None):
+    """Rebuilds the search index of one schema. Returns (output, seconds)."""
+    from django_tenants.utils import schema_context
+
+    from core.cache import bump_generation
+
+    from .models import SearchIndexQueue
+    from .search import SEARCH_GENERATION
+
+    started = time.perf_counter()
+    with schema_context(schema_name):
+        # Everything queued so far is covered by the rebuild, including
+        # objects the worker gave up on
+        SearchIndexQueue.objects.all().delete()
+        refresh_search_documents()
+        counts = rebuild_schema_index(chunk_size)
+        bump_generation(SEARCH_GENERATION)
+    output = '\n'.join(f'{label}: {count} indexed' for label, count in sorted(counts.items()))
+    return output, time.perf_counter() - started
+
+
+def _get_pending():
+    pending = getattr(_local, 'pending', None)
+    if pending is None:
+        pending = _local.pending = set()
+    return pending
+
+
+def enqueue_index_update(instance):
+    """Queues `instance` for (re)indexing, or removal, once the current transaction commits."""
+    from django.contrib.contenttypes.models import ContentType
+    from wagtail.models import Page
+
+    # Pages are indexed as their specific type
+    if isinstance(instance, Page):
+        content_type_id = instance.content_type_id
+        model = instance.specific_class or type(instance)
+    else:
+        content_type_id = ContentType.objects.get_for_model(instance).pk
+        model = type(instance)
+    pending = _get_pending()
+    pending.add((get_index_schema(model), content_type_id, str(instance.pk)))
+    transaction.on_commit(flush_pending)
+
+
+def flush_pending():
+    """
+    Writes the objects queued by the transaction(s) just committed. Called
+    once per save; the first call takes the whole set, so a page saved
+    repeatedly while publishing is written once. Objects left over from a
+    rolled back transaction go out with the next commit, which only costs
+    the worker a no-op reindex.
+    """
+    from django_tenants.utils import schema_context
+
+    pending = _get_pending()
+    by_schema = defaultdict(list)
+    while pending:
+        schema_name, content_type_id, object_id = pending.pop()
+        by_schema[schema_name].append((content_type_id, object_id))
+    for schema_name, keys in by_schema.items():
+        with schema_context(schema_name):
+            queue_objects(keys)
+
+
+def queue_objects(keys):
+    """
+    Upserts (content type id, object id) pairs into the queue. A row that's
+    already queued keeps its `queued_at`, so lag counts from the first
+    unindexed change, and gets its attempts reset.
+    """
+    from django.utils import timezone
+
+    from .models import SearchIndexQueue
+
+    now = timezone.now()
+    SearchIndexQueue.objects.bulk_create(
+        [
+            SearchIndexQueue(content_type_id=content_type_id, object_id=object_id, queued_at=now, updated_at=now)
+            for content_type_id, object_id in sorted(keys)
+        ],
+        update_conflicts=True,
+        unique_fields=['content_type', 'object_id'],
+        update_fields=['updated_at', 'attempts'],
+    )
+
+
+def apply_index_updates(model, object_ids):
+    """
+    Indexes the objects of `model` with the given ids in one bulk insert per
+    backend and removes those that no longer exist (or are no longer
+    indexed). Returns (indexed, removed).
+    """
+    from wagtail.search.backends import get_search_backends
+
+    objects = list(model.get_indexed_objects().filter(pk__in=object_ids))
+    missing = set(object_ids) - {str(obj.pk) for obj in objects}
+    # AUTO_UPDATE is off for the backends this queue feeds, so don't filter on it
+    for backend in get_search_backends():
+        if objects:
+            backend.add_bulk(model, objects)
+        for object_id in missing:
+            backend.delete(model(pk=object_id))
+    return len(objects), len(missing)
+
+
+def process_index_queue(batch_size=None):
+    """
+    Applies one batch of the current tenant's queue, oldest first. Returns
+    (indexed, removed, failed).
+
+    Rows stay locked until the batch commits, so an object saved meanwhile
+    is queued again rather than lost; concurrent workers skip locked rows.
+    A model whose objects fail to index is rolled back on its own and
+    retried up to SEARCH_INDEX_MAX_ATTEMPTS times.
+    """
+    from django.contrib.contenttypes.models import ContentType
+    from django.db.models import F
+    from wagtail.search.index import class_is_indexed
+
+    from core.cache import bump_generation
+
+    from .models import SearchIndexQueue
+    from .search import SEARCH_GENERATION
+
+    indexed = removed = 0
+    done, failed = [], []
+    with transaction.atomic():
+        rows = list(
+            SearchIndexQueue.objects.select_for_update(skip_locked=True)
+            .filter(attempts__lt=SEARCH_INDEX_MAX_ATTEMPTS)
+            .order_by('queued_at')[:batch_size or SEARCH_INDEX_BATCH_SIZE]
+        )
+        by_content_type = defaultdict(list)
+        for row in rows:
+            by_content_type[row.content_type_id].append(row)
+
+        for content_type_id, group in by_content_type.items():
+            model = ContentType.objects.get_for_id(content_type_id).model_class()
+            if model is None or not class_is_indexed(model):
+                done += group
+                removed += len(group)
+                continue
+            try:
+                with transaction.atomic():
+                    added, deleted = apply_index_updates(model, [row.object_id for row in group])
+            except Exception:
+                logger.exception("Indexing %d %s objects failed", len(group), model._meta.label)
+                failed += group
+                continue
+            done += group
+            indexed += added
+            removed += deleted
+
+        SearchIndexQueue.objects.filter(pk__in=[row.pk for row in done]).delete()
+        if failed:
+            SearchIndexQueue.objects.filter(pk__in=[row.pk for row in failed]).update(attempts=F('attempts') + 1)
+    if indexed or removed:
+        # Searches made since the publish cached the old results under the
+        # current generations
+        bump_generation(SEARCH_GENERATION)
+    return indexed, removed, len(failed)
+
+
+def drain_index_queue(batch_size=None):
+    """Processes the current tenant's queue until it's empty. Returns (indexed, removed, failed)."""
+    totals = [0, 0, 0]
+    while True:
+        counts = process_index_queue(batch_size)
+        totals = [total + count for total, count in zip(totals, counts)]
+        if not any(counts):
+            return tuple(totals)
+
+
+def get_index_lag():
+    """
+    (queued objects, seconds the oldest has waited, objects given up on)
+    for the current tenant. Objects given up on count towards neither the
+    queue nor the lag; they wait for rebuild_search_index.
+    """
+    from django.db.models import Count, Min, Q
+    from django.utils import timezone
+
+    from .models import SearchIndexQueue
+
+    pending = Q(attempts__lt=SEARCH_INDEX_MAX_ATTEMPTS)
+    stats = SearchIndexQueue.objects.aggregate(
+        queued=Count('pk', filter=pending),
+        oldest=Min('queued_at', filter=pending),
+        exhausted=Count('pk', filter=~pending),
+    )
+    lag = (timezone.now() - stats['oldest']).total_seconds() if stats['oldest'] else 0.0
+    return stats['queued'], lag, stats['exhausted']
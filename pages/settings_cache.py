@@ -0,0 +1,100 @@
+"""
+Cross-request cache for SiteSettings and ThemeSettings.
+
+Both settings rows are read on every page view but almost never change, so
+they are served as immutable snapshots held in-process, backed by the shared
+cache, and dropped by the save signals in pages.signals.
+"""
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+
+from core.cache import LocalCache, tenant_key
+
+SETTINGS_CACHE_TIMEOUT = getattr(settings, 'SETTINGS_CACHE_TIMEOUT', 60 * 60 * 24)
+SETTINGS_CACHE_LOCAL_TTL = getattr(settings, 'SETTINGS_CACHE_LOCAL_TTL', 30)
+
+_local_cache = LocalCache(maxsize=512, ttl=SETTINGS_CACHE_LOCAL_TTL)
+
+
+class SettingsSnapshot:
+    """
+    Read-only copy of a settings row. Column values are plain attributes;
+    foreign keys (logo, favicon, ...) are fetched on first access.
+    """
+
+    __slots__ = ('_model', '_values', '_related')
+
+    def __init__(self, model, values):
+        object.__setattr__(self, '_model', model)
+        object.__setattr__(self, '_values', dict(values))
+        object.__setattr__(self, '_related', {})
+
+    def __getattr__(self, name):
+        values = object.__getattribute__(self, '_values')
+        if name in values:
+            return values[name]
+        if name == 'pk':
+            return values['id']
+
+        model = object.__getattribute__(self, '_model')
+        try:
+            field = model._meta.get_field(name)
+        except Exception:
+            raise AttributeError(name)
+        if not field.is_relation or field.attname not in values:
+            raise AttributeError(name)
+
+        related = object.__getattribute__(self, '_related')
+        if name not in related:
+            related_id = values[field.attname]
+            related[name] = (
+                field.related_model._default_manager.filter(pk=related_id).first()
+                if related_id is not None else None
+            )
+        return related[name]
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self._model.__name__} snapshots are read-only")
+
+    def __repr__(self):
+        return f"<SettingsSnapshot {self._model.__name__} site={self._values.get('site_id')}>"
+
+
+def _cache_key(model, site_id):
+    return f"settings:{model._meta.label_lower}:{site_id}"
+
+
+def get_settings_snapshot(model, site):
+    """Returns a SettingsSnapshot of `model` for `site`, loading it on a miss."""
+    key = _cache_key(model, site.pk)
+    local_key = tenant_key(key)
+
+    snapshot = _local_cache.get(local_key)
+    if snapshot is None:
+        values = cache.get(key)
+        if values is None:
+            instance = model.for_site(site)
+            values = {
+                field.attname: getattr(instance, field.attname)
+                for field in model._meta.concrete_fields
+            }
+            cache.set(key, values, SETTINGS_CACHE_TIMEOUT)
+        snapshot = SettingsSnapshot(model, values)
+        _local_cache.set(local_key, snapshot)
+    return snapshot
+
+
+def get_site_settings(site):
+    return get_settings_snapshot(apps.get_model('pages', 'SiteSettings'), site)
+
+
+def get_theme_settings(site):
+    return get_settings_snapshot(apps.get_model('pages', 'ThemeSettings'), site)
+
+
+def invalidate_settings(model, site_id):
+    """Drops the cached snapshot of `model` for the given site."""
+    key = _cache_key(model, site_id)
+    cache.delete(key)
+    _local_cache.delete(tenant_key(key))
@@ -0,0 +1,88 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from wagtail.contrib.search_promotions.models import Query, SearchPromotion
+from wagtail.images import get_image_model
+from wagtail.models import Page, Site
+from wagtail.search.index import class_is_indexed
+from wagtail.signals import page_published, page_slug_changed, page_unpublished, post_page_move
+
+from core.cache import bump_generation
+
+from .models import Menu, MenuItem, SiteSettings, ThemeSettings
+from .page_cache import CONTENT_GENERATION, MENUS_GENERATION, SETTINGS_GENERATION
+from .rendition_queue import (
+    enqueue_renditions, get_image_rendition_items, get_page_rendition_items,
+    get_page_theme, get_settings_rendition_items,
+)
+from .search import SEARCH_GENERATION
+from .search_index import SEARCH_INDEX_QUEUE, enqueue_index_update
+from .settings_cache import invalidate_settings
+
+
+@receiver(post_save, sender=SiteSettings)
+@receiver(post_delete, sender=SiteSettings)
+@receiver(post_save, sender=ThemeSettings)
+@receiver(post_delete, sender=ThemeSettings)
+def invalidate_settings_cache(sender, instance, **kwargs):
+    invalidate_settings(sender, instance.site_id)
+    bump_generation(SETTINGS_GENERATION)
+
+
+@receiver(post_save, sender=Menu)
+@receiver(post_delete, sender=Menu)
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+def invalidate_menu_caches(sender, instance, **kwargs):
+    bump_generation(MENUS_GENERATION)
+
+
+@receiver(post_save, sender=Query)
+@receiver(post_delete, sender=Query)
+@receiver(post_save, sender=SearchPromotion)
+@receiver(post_delete, sender=SearchPromotion)
+def invalidate_search_caches(sender, instance, **kwargs):
+    bump_generation(SEARCH_GENERATION)
+
+
+@receiver(page_published)
+@receiver(page_unpublished)
+@receiver(post_page_move)
+@receiver(page_slug_changed)
+@receiver(post_delete, sender=Page)
+@receiver(post_save, sender=Site)
+@receiver(post_delete, sender=Site)
+def invalidate_page_caches(sender, instance, **kwargs):
+    # Listings, menus and breadcrumbs render other pages too, so any content
+    # change drops every cached page of the tenant.
+    bump_generation(CONTENT_GENERATION)
+
+
+@receiver(page_published)
+def queue_page_renditions(sender, instance, **kwargs):
+    enqueue_renditions(get_page_rendition_items(instance, get_page_theme(instance)))
+
+
+@receiver(post_save, sender=ThemeSettings)
+def queue_theme_settings_renditions(sender, instance, **kwargs):
+    enqueue_renditions(get_settings_rendition_items(theme_settings=instance))
+
+
+@receiver(post_save, sender=SiteSettings)
+def queue_site_settings_renditions(sender, instance, **kwargs):
+    enqueue_renditions(get_settings_rendition_items(site_settings=instance))
+
+
+@receiver(post_save, sender=get_image_model())
+def queue_image_renditions(sender, instance, created, **kwargs):
+    # Editing the file or focal point drops an image's renditions; a new
+    # upload isn't used anywhere yet and is picked up on publish instead.
+    if not created:
+        enqueue_renditions(get_image_rendition_items(instance))
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def queue_search_index_update(sender, instance, **kwargs):
+    # Replaces the search backend's own AUTO_UPDATE handlers
+    if SEARCH_INDEX_QUEUE and class_is_indexed(sender):
+        enqueue_index_update(instance)
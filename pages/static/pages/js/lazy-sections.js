@@ -0,0 +1,51 @@
+/* Replaces lazy section placeholders with their HTML as they near the viewport. */
+(function () {
+    if (window.lazySectionsLoaded) {
+        return;
+    }
+    window.lazySectionsLoaded = true;
+
+    function load(placeholder) {
+        fetch(placeholder.dataset.fragmentUrl, { credentials: 'same-origin' })
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+                return response.text();
+            })
+            .then(function (html) {
+                placeholder.outerHTML = html;
+                if (window.AOS) {
+                    window.AOS.refreshHard();
+                }
+            })
+            .catch(function () {
+                placeholder.removeAttribute('aria-busy');
+            });
+    }
+
+    function init() {
+        var placeholders = document.querySelectorAll('[data-fragment-url]');
+        if (!('IntersectionObserver' in window)) {
+            placeholders.forEach(load);
+            return;
+        }
+        var observer = new IntersectionObserver(function (entries) {
+            entries.forEach(function (entry) {
+                if (entry.isIntersecting) {
+                    observer.unobserve(entry.target);
+                    load(entry.target);
+                }
+            });
+        }, { rootMargin: '600px 0px' });
+        placeholders.forEach(function (placeholder) {
+            observer.observe(placeholder);
+        });
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', init);
+    } else {
+        init();
+    }
+})();
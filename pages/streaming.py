@@ -0,0 +1,131 @@
+"""
+Streaming page responses.
+
+A page template renders its StreamField sections through
+`themes/<theme>/pages/_section.html`. When streaming, the template is first
+rendered with `streamed_sections` set to a placeholder, which takes the place
+of the section loop; that shell is cheap since no block is rendered. The
+response then sends everything before the placeholder (the <head>,
+stylesheets and header), each section as soon as it is rendered, and the
+rest of the shell. Time to first byte no longer depends on how many sections
+a page has.
+
+Pages opt in with `sections_field`, the name of the StreamField to stream,
+and the PAGE_STREAMING_ENABLED setting. Under WSGI the server iterates the
+response itself. Django's ASGI handler would read a plain iterator in full
+before sending anything, so ASGI requests get an async iterator instead,
+which renders each section in the request's thread (the blocking ORM and
+template work stay off the event loop) and hands it over as it's done.
+
+Sections render after the middleware has processed the response, so they
+can't set cookies or consume messages. The shell is therefore rendered
+before the response is returned, and pages that have messages to show or a
+visible block with `renders_form = True` in its Meta (a form needs a CSRF
+token, and so the cookie) aren't streamed.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.template.context import make_context
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from .compression import HTML_MINIFY_ENABLED, minify_html
+from .fragments import is_visible, visible_blocks
+from .theme import get_theme_resolver
+
+PAGE_STREAMING_ENABLED = getattr(settings, 'PAGE_STREAMING_ENABLED', False)
+
+STREAM_PLACEHOLDER = mark_safe('<!--streamed-sections-->')
+
+_done = object()
+
+
+def has_form_sections(page):
+    field = page._meta.get_field(page.sections_field)
+    child_blocks = field.stream_block.child_blocks
+    for child in getattr(page, page.sections_field).raw_data:
+        block = child_blocks.get(child.get('type'))
+        if block is not None and getattr(block.meta, 'renders_form', False) and is_visible(child):
+            return True
+    return False
+
+
+def has_pending_messages(request):
+    # len() loads the messages without marking them as seen
+    return hasattr(request, '_messages') and len(get_messages(request)) > 0
+
+
+def can_stream(page, request):
+    return (
+        PAGE_STREAMING_ENABLED
+        and bool(getattr(page, 'sections_field', None))
+        and not has_pending_messages(request)
+        and not has_form_sections(page)
+    )
+
+
+def section_template_name(request):
+    return get_theme_resolver(request).page_template('_section.html')
+
+
+def render_shell(page, request, *args, **kwargs):
+    """(context, head, tail) of the page, split where its sections go; tail is None if it has no placeholder."""
+    context = page.get_context(request, *args, **kwargs)
+    shell = get_template(page.get_template(request, *args, **kwargs)).render(
+        {**context, 'streamed_sections': STREAM_PLACEHOLDER}, request,
+    )
+    head, placeholder, tail = shell.partition(STREAM_PLACEHOLDER)
+    return context, head, tail if placeholder else None
+
+
+def iter_page(page, request, context, head, tail):
+    """Yields the page's HTML: the shell up to the sections, each section, then the rest."""
+    yield head
+    if tail is None:
+        # The template renders its own sections
+        return
+
+    section_template = get_template(section_template_name(request)).template
+    section_context = make_context(context, request)
+    # Bound once, so context processors run once rather than per section
+    with section_context.bind_template(section_template):
+        for block in visible_blocks(getattr(page, page.sections_field)):
+            with section_context.push(block=block):
+                yield section_template.render(section_context)
+    yield tail
+
+
+async def aiter_chunks(chunks):
+    """Iterates a blocking iterator from async code, one chunk at a time, in the request's thread."""
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while True:
+        chunk = await next_chunk(chunks, _done)
+        if chunk is _done:
+            return
+        yield chunk
+
+
+def stream_page(page, request, *args, on_complete=None, minify=False, **kwargs):
+    """
+    A StreamingHttpResponse of the page. `on_complete(response, content)` is
+    called with the full HTML once every chunk has been sent, so the page
+    cache can keep a copy; `minify` minifies each chunk when HTML_MINIFY_ENABLED.
+    """
+    context, head, tail = render_shell(page, request, *args, **kwargs)
+
+    def content():
+        chunks = []
+        for chunk in iter_page(page, request, context, head, tail):
+            if minify and HTML_MINIFY_ENABLED:
+                chunk = minify_html(chunk)
+            chunks.append(chunk)
+            yield chunk
+        if on_complete is not None:
+            on_complete(response, ''.join(chunks).encode(response.charset))
+
+    streaming_content = aiter_chunks(content()) if isinstance(request, ASGIRequest) else content()
+    response = StreamingHttpResponse(streaming_content, content_type='text/html; charset=utf-8')
+    return response
@@ -0,0 +1,121 @@
+"""
+Compiled, content-hashed theme stylesheets.
+
+Each theme keeps its CSS in `themes/<theme>/theme.css`, a template rendered
+with the site's ThemeSettings (colours, fonts). It is compiled and minified
+with libsass when ThemeSettings is saved and written to default_storage under
+`theme-css/<schema>/`, so pages link one long-lived cacheable file instead of
+inlining the same CSS in every response. File names carry the theme manifest
+version, so a deploy that edits theme.css recompiles on the next request.
+
+ThemeSettings keeps the name compiled when it was saved. A worker whose
+manifest version differs (e.g. during a rolling deploy) compiles its own
+and keeps that name in the cache, per stored name and version, so workers
+on either side of a deploy never overwrite each other's. Replaced files are
+left in place, as cached pages may still link them; `manage.py
+clean_theme_stylesheets` removes unused ones after a grace period.
+"""
+import hashlib
+import logging
+import re
+
+import django_libsass
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.template.loader import render_to_string
+
+from core.cache import LocalCache, tenant_key
+
+from .theme_manifest import THEMES_DIR, manifest
+
+logger = logging.getLogger(__name__)
+
+# Sites whose stylesheet failed to compile, so they aren't retried per request
+_failed = LocalCache(maxsize=256, ttl=300)
+# Names compiled for this manifest version when the stored one is for another
+_compiled = LocalCache(maxsize=256, ttl=300)
+STYLESHEET_NAME_TIMEOUT = 60 * 60 * 24 * 7
+
+STYLESHEET_DIR = 'theme-css'
+
+# <site_id>.<manifest version>.<content hash>.css
+STYLESHEET_NAME_RE = re.compile(r'^\d+\.[0-9a-f]{12}\.[0-9a-f]{12}\.css$')
+
+
+def theme_stylesheet_template(theme):
+    return f"{THEMES_DIR}/{theme}/theme.css"
+
+
+def stylesheet_path(name, schema_name=None):
+    return f"{STYLESHEET_DIR}/{schema_name or connection.schema_name}/{name}"
+
+
+def render_theme_css(config):
+    """Renders and minifies the theme.css template for a ThemeSettings row."""
+    source = render_to_string(theme_stylesheet_template(config.base_theme), {'config': config})
+    return django_libsass.compile(string=source, output_style='compressed')
+
+
+def compile_theme_stylesheet(config):
+    """
+    Compiles the stylesheet for `config` into default_storage and returns its
+    name, or '' when the theme has no theme.css or compilation fails (pages
+    then inline the CSS instead).
+    """
+    if not manifest.exists(theme_stylesheet_template(config.base_theme)):
+        return ''
+    try:
+        css = render_theme_css(config)
+    except Exception:
+        logger.exception("Could not compile the %s stylesheet for site %s",
+                         config.base_theme, config.site_id)
+        return ''
+
+    digest = hashlib.md5(css.encode('utf-8')).hexdigest()[:12]
+    name = f"{config.site_id}.{manifest.version}.{digest}.css"
+    path = stylesheet_path(name)
+    if not default_storage.exists(path):
+        default_storage.save(path, ContentFile(css.encode('utf-8')))
+    return name
+
+
+def is_current(name):
+    return bool(name) and name.split('.')[1:2] == [manifest.version]
+
+
+def compiled_name_key(config):
+    """Cache key of this manifest version's stylesheet name for a stored name."""
+    return f"theme-stylesheet:{config.site_id}:{manifest.version}:{config.stylesheet_name}"
+
+
+def get_theme_stylesheet_name(config):
+    """
+    Returns the compiled stylesheet name for `config`, compiling one for
+    this worker's theme.css when the stored name was built from another.
+    """
+    if config is None:
+        return ''
+    name = config.stylesheet_name
+    if is_current(name):
+        return name
+
+    # The stored name changes whenever ThemeSettings is saved, so this
+    # version's compiled name is keyed on it
+    key = compiled_name_key(config)
+    local_key = tenant_key(key)
+    compiled = _compiled.get(local_key) or cache.get(key)
+    if compiled:
+        _compiled.set(local_key, compiled)
+        return compiled
+
+    if _failed.get(local_key):
+        return ''
+    compiled = compile_theme_stylesheet(config)
+    if not compiled:
+        _failed.set(local_key, True)
+        return ''
+    cache.set(key, compiled, STYLESHEET_NAME_TIMEOUT)
+    _compiled.set(local_key, compiled)
+    return compiled
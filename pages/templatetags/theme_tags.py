@@ -1,5 +1,15 @@
 from django import template
-from pages.models import ThemeSettings
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+from pages.assets import get_bundle_path
+from pages.critical_css import get_critical_css
+from pages.fragments import LAZY_SECTIONS_SCRIPT, has_lazy_sections, render_section, visible_blocks as get_visible_blocks
+from pages.menus import get_menu as cached_menu
+from pages.renditions import responsive_image_html
+from pages.stylesheets import get_theme_stylesheet_name
+from pages.theme import get_theme_resolver
 
 register = template.Library()
 
@@ -7,14 +17,7 @@ register = template.Library()
 def get_theme_config(context):
     """Returns the current site's ThemeSettings with fallback."""
     try:
-        from wagtail.models import Site
-        request = context.get('request')
-        site = getattr(request, 'site', None)
-        
-        if not site:
-            site = Site.objects.get(is_default_site=True)
-            
-        return ThemeSettings.for_site(site)
+        return get_theme_resolver(context.get('request')).config
     except Exception:
         return None
 @register.simple_tag
@@ -35,28 +38,91 @@ def get_google_fonts_url(config):
     family_str = "&family=".join(fonts)
     return f"https://fonts.googleapis.com/css2?family={family_str}&display=swap"
 
-@register.simple_tag
-def get_menu(slug):
-    """Returns a Menu snippet by slug."""
+@register.simple_tag(takes_context=True)
+def get_menu(context, slug):
+    """Returns a cached menu (title, slug, items) by slug."""
     try:
-        from pages.models import Menu
-        return Menu.objects.get(slug=slug)
+        return cached_menu(slug, context.get('request'))
     except Exception:
         return None
 
+@register.simple_tag(takes_context=True)
+def theme_stylesheet_url(context):
+    """URL of the site's compiled theme stylesheet, or None to inline the CSS."""
+    request = context.get('request')
+    if getattr(request, 'is_preview', False):
+        return None
+    try:
+        name = get_theme_stylesheet_name(get_theme_resolver(request).config)
+    except Exception:
+        return None
+    return reverse('theme_stylesheet', args=[name]) if name else None
+
+@register.simple_tag(takes_context=True)
+def critical_css(context):
+    """Critical CSS to inline for the current page type, or '' to link the stylesheets normally."""
+    request = context.get('request')
+    page = context.get('page')
+    if getattr(request, 'is_preview', False) or not getattr(page, 'theme_template', None):
+        return ''
+    try:
+        resolver = get_theme_resolver(request)
+        css = get_critical_css(resolver.config, resolver.page_template(page.theme_template))
+    except Exception:
+        return ''
+    # Don't let a '</' in the CSS close the <style> element
+    return mark_safe(css.replace('</', '<\\/'))
+
+@register.simple_tag
+def deferred_stylesheet(url):
+    """A stylesheet link that doesn't block rendering, with a <noscript> fallback."""
+    return format_html(
+        '<link rel="preload" href="{0}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">'
+        '<noscript><link rel="stylesheet" href="{0}"></noscript>',
+        url,
+    )
+
+@register.simple_tag
+def theme_bundle(theme, kind):
+    """Static path of the theme's self-hosted "css"/"js" bundle, or None to use the CDNs."""
+    return get_bundle_path(theme, kind)
+
+@register.simple_tag(takes_context=True)
+def responsive_image(context, image, role, **attrs):
+    """
+    Renders `image` as a responsive <img> using the current theme's rendition
+    spec for `role`, e.g. {% responsive_image self.image "hero" class="img-fluid" %}.
+    """
+    if not image:
+        return ''
+    theme = get_theme_resolver(context.get('request')).theme
+    return responsive_image_html(image, role, theme, **attrs)
+
+@register.simple_tag(takes_context=True)
+def include_cached_block(context, block):
+    """
+    Like {% include_block %}, but serves the section's HTML from the fragment
+    cache, or renders a lazy-loading placeholder for heavy sections.
+    """
+    return render_section(block, context)
+
+@register.simple_tag(takes_context=True)
+def lazy_sections_script(context):
+    """The lazy section loader, on pages that have lazy sections."""
+    if not has_lazy_sections(context.get('page'), context.get('request')):
+        return ''
+    return format_html('<script src="{}" defer></script>', static(LAZY_SECTIONS_SCRIPT))
+
+@register.filter
+def visible_blocks(stream_value):
+    """The StreamField children whose `visible` toggle is on."""
+    return get_visible_blocks(stream_value)
+
 @register.simple_tag(takes_context=True)
 def get_site_settings(context):
     """Returns the current site's SiteSettings with fallback."""
     try:
-        from wagtail.models import Site
-        from pages.models import SiteSettings
-        request = context.get('request')
-        site = getattr(request, 'site', None)
-        
-        if not site:
-            site = Site.objects.get(is_default_site=True)
-            
-        return SiteSettings.for_site(site)
+        return get_theme_resolver(context.get('request')).settings
     except Exception:
         return None
 
@@ -0,0 +1,70 @@
+"""
+Request-scoped theme resolution.
+
+The site, its settings snapshots and the active theme are resolved once per
+request and attached to it. Page types, BaseBlock, the theme template tags and
+the global context processor all read from the same ThemeResolver instead of
+each repeating the Site/ThemeSettings lookups.
+"""
+from django.utils.functional import cached_property
+from wagtail.models import Site
+
+from .settings_cache import get_site_settings, get_theme_settings
+from .theme_manifest import FALLBACK_THEME, manifest
+
+REQUEST_ATTR = '_theme_resolver'
+
+
+class ThemeResolver:
+    def __init__(self, request=None):
+        self.request = request
+
+    @cached_property
+    def site(self):
+        site = None
+        if self.request is not None:
+            site = getattr(self.request, 'site', None) or Site.find_for_request(self.request)
+        if site is None:
+            site = Site.objects.filter(is_default_site=True).first()
+        return site
+
+    @cached_property
+    def settings(self):
+        return get_site_settings(self.site) if self.site else None
+
+    @cached_property
+    def config(self):
+        return get_theme_settings(self.site) if self.site else None
+
+    @cached_property
+    def theme(self):
+        return self.config.base_theme if self.config else FALLBACK_THEME
+
+    def page_template(self, template_name):
+        return f"themes/{self.theme}/pages/{template_name}"
+
+    def block_variant(self, block_name, value):
+        """
+        The block's own variant, unless it is left on the default 'v1' and the
+        site's ThemeSettings picks another variant for this block type.
+        """
+        config_variant = getattr(self.config, f"{block_name}_variant", 'v1') if self.config else 'v1'
+        variant = value.get('variant', config_variant)
+        if variant == 'v1' and config_variant != 'v1':
+            variant = config_variant
+        return variant
+
+    def block_template(self, block_name, value):
+        variant = self.block_variant(block_name, value)
+        return manifest.resolve_block_template(self.theme, block_name, variant)
+
+
+def get_theme_resolver(request=None):
+    """Returns the ThemeResolver attached to `request`, creating it on first use."""
+    if request is None:
+        return ThemeResolver()
+    resolver = getattr(request, REQUEST_ATTR, None)
+    if resolver is None:
+        resolver = ThemeResolver(request)
+        setattr(request, REQUEST_ATTR, resolver)
+    return resolver
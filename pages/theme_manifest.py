@@ -0,0 +1,116 @@
+"""
+In-memory manifest of the templates under `themes/`.
+
+BaseBlock.get_template used to stat() up to three candidate paths per template
+dir on every block render. The manifest walks every template directory known to
+the template engines (project DIRS and app `templates/` dirs) once, so picking
+a block variant is a dictionary lookup.
+"""
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+from django.dispatch import receiver
+from django.template import engines
+from django.utils.autoreload import file_changed
+
+THEMES_DIR = 'themes'
+FALLBACK_THEME = 'modern'
+
+
+def block_template_candidates(theme, block_name, variant):
+    """Template names tried, in order, for a block variant."""
+    return [
+        f"{THEMES_DIR}/{theme}/blocks/{block_name}/{variant}.html",
+        f"{THEMES_DIR}/{theme}/blocks/{block_name}/v1.html",
+        f"{THEMES_DIR}/{FALLBACK_THEME}/blocks/{block_name}/v1.html",
+    ]
+
+
+def get_template_dirs():
+    dirs = []
+    for engine in engines.all():
+        for template_dir in getattr(engine, 'template_dirs', ()):
+            if str(template_dir) not in dirs:
+                dirs.append(str(template_dir))
+    return dirs
+
+
+class ThemeTemplateManifest:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._templates = None
+        self._version = None
+        self._resolved = {}
+
+    def build(self):
+        """
+        Walks the template dirs and returns the set of theme template names,
+        plus a version fingerprint of their names and contents.
+        """
+        templates = set()
+        fingerprint = hashlib.md5()
+        for template_dir in get_template_dirs():
+            themes_root = os.path.join(template_dir, THEMES_DIR)
+            for root, _dirs, files in sorted(os.walk(themes_root)):
+                for filename in sorted(files):
+                    path = os.path.join(root, filename)
+                    name = Path(os.path.relpath(path, template_dir)).as_posix()
+                    templates.add(name)
+                    fingerprint.update(name.encode('utf-8'))
+                    with open(path, 'rb') as f:
+                        fingerprint.update(f.read())
+        return frozenset(templates), fingerprint.hexdigest()[:12]
+
+    def reload(self):
+        templates, version = self.build()
+        with self._lock:
+            self._templates = templates
+            self._version = version
+            self._resolved = {}
+        return templates
+
+    def _ensure_built(self):
+        if self._templates is None:
+            with self._lock:
+                if self._templates is None:
+                    self._templates, self._version = self.build()
+
+    @property
+    def templates(self):
+        self._ensure_built()
+        return self._templates
+
+    @property
+    def version(self):
+        """Changes whenever a theme template is added, removed or edited."""
+        self._ensure_built()
+        return self._version
+
+    def exists(self, template_name):
+        return template_name in self.templates
+
+    def resolve_block_template(self, theme, block_name, variant):
+        """
+        Returns the first existing template for the block variant, or the
+        preferred name when none exist so the loader reports the real miss.
+        """
+        key = (theme, block_name, variant)
+        resolved = self._resolved.get(key)
+        if resolved is None:
+            candidates = block_template_candidates(theme, block_name, variant)
+            templates = self.templates
+            resolved = next((t for t in candidates if t in templates), candidates[0])
+            self._resolved[key] = resolved
+        return resolved
+
+
+manifest = ThemeTemplateManifest()
+
+
+@receiver(file_changed, dispatch_uid='pages_theme_manifest_reload')
+def reload_on_template_change(sender, file_path, **kwargs):
+    # Development autoreloader: keep the manifest in sync with added/removed templates.
+    if f"{os.sep}{THEMES_DIR}{os.sep}" in str(file_path):
+        manifest.reload()
@@ -5,23 +5,14 @@ from .models import ThemeSettings
 
 
 def search(request):
-    search_query = request.GET.get("query", None)
-    page = request.GET.get("page", 1)
+    from .search import search_site
 
-    # Search
-    if search_query:
-        search_results = Page.objects.live().search(search_query)
-    else:
-        search_results = Page.objects.none()
+    search_query = request.GET.get("query", None)
 
-    # Pagination
-    paginator = Paginator(search_results, 10)
-    try:
-        search_results = paginator.page(page)
-    except PageNotAnInteger:
-        search_results = paginator.page(1)
-    except EmptyPage:
-        search_results = paginator.page(paginator.num_pages)
+    search_results, search_promotions = search_site(
+        search_query, Site.find_for_request(request),
+        after=request.GET.get("after"), before=request.GET.get("before"), request=request,
+    )
 
     return render(
         request,
@@ -29,9 +20,21 @@ def search(request):
         {
             "search_query": search_query,
             "search_results": search_results,
+            "search_promotions": search_promotions,
         },
     )
 
+
+def search_autocomplete(request):
+    """JSON title suggestions for the search box: {"results": [{"title", "url"}]}."""
+    from django.http import JsonResponse
+    from .search import autocomplete
+
+    suggestions = autocomplete(request.GET.get("query", ""), Site.find_for_request(request), request)
+    response = JsonResponse({"results": suggestions})
+    response['Cache-Control'] = 'public, max-age=60'
+    return response
+
 def theme_customizer(request):
     """View for full-page visual theme editing."""
     from django import forms
@@ -120,3 +123,56 @@ def theme_customizer(request):
         'current_logo': config.logo,
         'current_hero_bg': config.hero_bg_image,
     })
+
+
+def theme_stylesheet(request, name):
+    """Serves a compiled theme stylesheet; names are content-hashed, so it never changes."""
+    from django.core.files.storage import default_storage
+    from django.http import FileResponse, Http404
+    from .stylesheets import STYLESHEET_NAME_RE, stylesheet_path
+
+    path = stylesheet_path(name)
+    if not STYLESHEET_NAME_RE.match(name) or not default_storage.exists(path):
+        raise Http404
+    response = FileResponse(default_storage.open(path), content_type='text/css')
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+def section_fragment(request, page_id, block_id):
+    """Renders one visible section of a live page, for lazily loaded sections."""
+    from django.http import Http404, HttpResponse
+    from django.template.loader import render_to_string
+    from django.utils.cache import get_conditional_response
+    from core.cache import get_generations
+    from .fragments import FRAGMENT_MAX_AGE, find_block
+    from .page_cache import PAGE_GENERATIONS, page_validators, set_validators
+    from .theme import get_theme_resolver
+
+    site = get_theme_resolver(request).site
+    page = None
+    if site is not None:
+        page = (
+            Page.objects.live().public().descendant_of(site.root_page, inclusive=True)
+            .filter(pk=page_id).specific().first()
+        )
+    field_name = getattr(page, 'sections_field', None)
+    if field_name is None:
+        raise Http404
+
+    etag, last_modified = page_validators(page, request, get_generations(*PAGE_GENERATIONS))
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        block = find_block(getattr(page, field_name), block_id)
+        if block is None:
+            raise Http404
+        context = page.get_context(request)
+        context.update(block=block, rendering_fragment=True)
+        response = HttpResponse(render_to_string('pages/fragments/section.html', context, request))
+    elif response.status_code != 304:
+        return response
+
+    response['Cache-Control'] = f'public, max-age={FRAGMENT_MAX_AGE}'
+    response['X-Robots-Tag'] = 'noindex'
+    set_validators(response, etag, last_modified)
+    return response
@@ -0,0 +1,54 @@
+"""
+Boot-time template warmup.
+
+Django's cached template loader compiles each template the first time it is
+used, so without this the first requests a worker serves after a deploy or
+scale-up pay for parsing base.html, the page templates and every block
+variant they touch. core.wsgi and core.asgi call warm_templates() once the
+application is loaded, which compiles every template in the theme manifest
+into the loader cache and logs how long that took. With gunicorn's
+--preload the work happens once in the master and workers inherit it.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.template.loader import get_template
+
+from .theme_manifest import manifest
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_WARMUP = getattr(settings, 'TEMPLATE_WARMUP', not settings.DEBUG)
+
+
+def warm_templates():
+    """
+    Compiles every theme template. Returns {template name: seconds}; templates
+    that fail to compile are logged and left out.
+    """
+    started = time.perf_counter()
+    timings = {}
+    for name in sorted(manifest.templates):
+        template_started = time.perf_counter()
+        try:
+            get_template(name)
+        except Exception:
+            logger.exception("Template %s failed to compile", name)
+            continue
+        timings[name] = time.perf_counter() - template_started
+
+    elapsed = time.perf_counter() - started
+    slowest = sorted(timings, key=timings.get, reverse=True)[:3]
+    logger.info(
+        "Compiled %d of %d theme templates in %.0f ms (slowest: %s)",
+        len(timings), len(manifest.templates), elapsed * 1000,
+        ", ".join(f"{name} {timings[name] * 1000:.1f} ms" for name in slowest),
+    )
+    return timings
+
+
+def warm_up():
+    """Entry point for core.wsgi and core.asgi."""
+    if TEMPLATE_WARMUP:
+        warm_templates()
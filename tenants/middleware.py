@@ -0,0 +1,84 @@
+"""
+Tenant middleware with an in-process hostname resolution cache.
+
+TenantMainMiddleware queries tenants.Domain on every request, and Wagtail then
+matches the same hostname against Site inside the tenant schema. Both answers
+are kept per hostname in LRU caches with a TTL. Entries hold field values
+rather than model instances, so every request gets its own Tenant and Site
+(and loads the site's root page afresh).
+
+Keys include the 'tenants' generation in the shared cache, which
+tenants.signals bumps when a Domain, Tenant or Site is saved or deleted, so
+every process stops using its entries at once. Domains, tenants and sites
+live in the public schema, and so does the generation.
+"""
+from django.conf import settings
+from django.db import connection
+from django_tenants.middleware.main import TenantMainMiddleware
+from django_tenants.utils import get_public_schema_name, get_tenant_model, schema_context
+from wagtail.models import Site
+
+from core.cache import LocalCache, bump_generation, get_generations
+
+TENANT_CACHE_TTL = getattr(settings, 'TENANT_CACHE_TTL', 300)
+TENANT_CACHE_MAXSIZE = getattr(settings, 'TENANT_CACHE_MAXSIZE', 2048)
+
+TENANT_GENERATION = 'tenants'
+
+tenant_cache = LocalCache(maxsize=TENANT_CACHE_MAXSIZE, ttl=TENANT_CACHE_TTL)
+site_cache = LocalCache(maxsize=TENANT_CACHE_MAXSIZE, ttl=TENANT_CACHE_TTL)
+
+
+def get_tenant_generation():
+    with schema_context(get_public_schema_name()):
+        return get_generations(TENANT_GENERATION)[TENANT_GENERATION]
+
+
+def bump_tenant_generation():
+    with schema_context(get_public_schema_name()):
+        bump_generation(TENANT_GENERATION)
+
+
+def freeze(instance):
+    """The concrete field values of a model instance, to cache in its place."""
+    fields = instance._meta.concrete_fields
+    return [f.attname for f in fields], [getattr(instance, f.attname) for f in fields]
+
+
+def thaw(model, frozen):
+    """A new instance of `model` from freeze()'s values, as if loaded from the database."""
+    field_names, values = frozen
+    return model.from_db(None, field_names, values)
+
+
+class CachedTenantMiddleware(TenantMainMiddleware):
+    def get_tenant(self, domain_model, hostname):
+        key = (get_tenant_generation(), hostname)
+        frozen = tenant_cache.get(key)
+        if frozen is None:
+            tenant = super().get_tenant(domain_model, hostname)
+            tenant_cache.set(key, freeze(tenant))
+            return tenant
+        return thaw(get_tenant_model(), frozen)
+
+    def process_request(self, request):
+        response = super().process_request(request)
+        if response is None:
+            self.resolve_site(request)
+        return response
+
+    @staticmethod
+    def resolve_site(request):
+        """
+        Primes Wagtail's per-request site (request._wagtail_site, as used by
+        Site.find_for_request) from the hostname cache.
+        """
+        key = (get_tenant_generation(), connection.schema_name, request.get_host())
+        frozen = site_cache.get(key)
+        if frozen is None:
+            site = Site.find_for_request(request)
+            if site is not None:
+                site_cache.set(key, freeze(site))
+        else:
+            site = request._wagtail_site = thaw(Site, frozen)
+        return site
@@ -0,0 +1,78 @@
+"""
+django-tenants PostgreSQL backend that skips redundant SET search_path calls.
+
+The stock backend sends SET search_path whenever a cursor is created after
+set_tenant()/set_schema(), even when the connection is already on that schema.
+This wrapper remembers the search_path active on the physical connection and
+only sends SET when it differs. Requires TENANT_LIMIT_SET_CALLS = True.
+
+The remembered path is trusted for the life of the connection, so every
+Django connection must keep one server connection: connect directly or
+through pgbouncer in session pooling mode. Transaction pooling is not
+supported; a session-level SET would stay on a server connection that the
+next client, possibly another tenant's request, then picks up.
+"""
+import threading
+
+from django_tenants.postgresql_backend import base as tenant_backend
+
+_stats_lock = threading.Lock()
+_stats = {'issued': 0, 'skipped': 0}
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def get_search_path_stats():
+    """Process-wide counts of SET search_path statements issued and skipped."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+class DatabaseWrapper(tenant_backend.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        self.active_search_path = None
+        super().__init__(*args, **kwargs)
+
+    def get_new_connection(self, conn_params):
+        self._forget_search_path()
+        return super().get_new_connection(conn_params)
+
+    def close(self):
+        self._forget_search_path()
+        super().close()
+
+    def _rollback(self):
+        # PostgreSQL undoes a SET made inside the rolled back transaction
+        self._forget_search_path()
+        return super()._rollback()
+
+    def _savepoint_rollback(self, sid):
+        # Likewise for a SET made after the savepoint
+        self._forget_search_path()
+        return super()._savepoint_rollback(sid)
+
+    def _forget_search_path(self):
+        self.active_search_path = None
+
+    def _search_path_is_current(self):
+        if self.active_search_path is None or not self.schema_name:
+            return False
+        return self._get_cursor_search_paths() == self.active_search_path
+
+    def _cursor(self, name=None):
+        if self._search_path_is_current():
+            # The base class skips the SET when it believes the path is set
+            self.search_path_set_schemas = self.active_search_path
+            _count('skipped')
+            return super()._cursor(name=name)
+
+        self.search_path_set_schemas = None
+        cursor = super()._cursor(name=name)
+        # None here means the SET failed (e.g. in an aborted transaction)
+        self.active_search_path = self.search_path_set_schemas
+        if self.active_search_path is not None:
+            _count('issued')
+        return cursor
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from wagtail.models import Site
+
+from .middleware import bump_tenant_generation, site_cache, tenant_cache
+from .models import Domain, Tenant
+
+
+@receiver(post_save, sender=Domain)
+@receiver(post_delete, sender=Domain)
+@receiver(post_save, sender=Tenant)
+@receiver(post_delete, sender=Tenant)
+def clear_tenant_cache(sender, **kwargs):
+    # Other processes see the new generation; this one can free its entries now
+    bump_tenant_generation()
+    tenant_cache.clear()
+    site_cache.clear()
+
+
+@receiver(post_save, sender=Site)
+@receiver(post_delete, sender=Site)
+def clear_site_cache(sender, **kwargs):
+    bump_tenant_generation()
+    site_cache.clear()
@@ -0,0 +1,78 @@
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django_tenants.utils import get_public_schema_name
+from wagtail.models import Site
+
+from tenants.middleware import bump_tenant_generation, freeze, get_tenant_generation, thaw
+from tenants.postgresql_backend.base import get_search_path_stats
+
+
+class Rollback(Exception):
+    pass
+
+
+class SearchPathMixin:
+    def set_schema_and_roll_back(self):
+        with self.assertRaises(Rollback):
+            with transaction.atomic():
+                connection.set_schema(get_public_schema_name())
+                connection.cursor().close()
+                self.assertIsNotNone(connection.active_search_path)
+                raise Rollback
+
+    def assert_next_cursor_sets_search_path(self, sets=True):
+        stats = get_search_path_stats()
+        connection.cursor().close()
+        after = get_search_path_stats()
+        self.assertEqual(after['issued'], stats['issued'] + int(sets))
+        self.assertEqual(after['skipped'], stats['skipped'] + int(not sets))
+
+
+class SavepointRollbackTests(SearchPathMixin, TestCase):
+    # TestCase wraps each test in a transaction, so the inner atomic block
+    # rolls back to a savepoint
+    def test_search_path_is_sent_again_after_savepoint_rollback(self):
+        self.set_schema_and_roll_back()
+        self.assertIsNone(connection.active_search_path)
+        self.assert_next_cursor_sets_search_path()
+
+
+class TransactionRollbackTests(SearchPathMixin, TransactionTestCase):
+    def test_search_path_is_sent_again_after_rollback(self):
+        self.set_schema_and_roll_back()
+        self.assertIsNone(connection.active_search_path)
+        self.assert_next_cursor_sets_search_path()
+
+
+class AutocommitTests(SearchPathMixin, TransactionTestCase):
+    def setUp(self):
+        connection.set_schema(get_public_schema_name())
+        connection.close()
+
+    def test_search_path_set_in_autocommit_is_kept_for_the_connection(self):
+        self.assertTrue(connection.get_autocommit())
+        self.assert_next_cursor_sets_search_path()
+        self.assert_next_cursor_sets_search_path(sets=False)
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW search_path')
+            self.assertIn(get_public_schema_name(), cursor.fetchone()[0])
+
+    def test_search_path_is_sent_again_after_reconnecting(self):
+        self.assert_next_cursor_sets_search_path()
+        connection.close()
+        self.assert_next_cursor_sets_search_path()
+
+
+class HostnameCacheTests(SimpleTestCase):
+    def test_bump_changes_the_generation(self):
+        generation = get_tenant_generation()
+        bump_tenant_generation()
+        self.assertNotEqual(get_tenant_generation(), generation)
+
+    def test_cached_site_is_a_new_instance_per_lookup(self):
+        site = Site(pk=1, hostname='example.com', port=80, root_page_id=3, is_default_site=True)
+        frozen = freeze(site)
+        first, second = thaw(Site, frozen), thaw(Site, frozen)
+        self.assertIsNot(first, second)
+        self.assertEqual((first.pk, first.hostname, first.root_page_id), (1, 'example.com', 3))
+        self.assertFalse(first._state.adding)